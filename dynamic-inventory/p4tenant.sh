@@ -0,0 +1,19 @@
+#!/usr/bin/env bash
+# Ansible dynamic inventory built by p4tenant from inventory.yaml, group_vars/,
+# host_vars/ and admins.yaml (p4tenant inventory --list).
+#
+#   P4TENANT_ADMIN=pgiaccone ansible-playbook -i dynamic-inventory/p4tenant.sh playbooks/adduser.yaml
+#
+# It lives outside the repository root on purpose: ansible then gets every
+# variable from the single JSON document and doesn't load group_vars/ and
+# host_vars/ again next to the inventory.
+
+set -e
+
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+cd "$SCRIPT_DIR/.."
+
+if command -v p4tenant &> /dev/null; then
+    exec p4tenant inventory "$@"
+fi
+exec ./p4tenant-cli inventory "$@"
@@ -0,0 +1,53 @@
+"""Per-run ansible configuration overlay, passed to ansible-playbook through its environment."""
+
+import os
+from pathlib import Path
+from typing import Optional
+
+from .config import FACT_CACHE_DIR, FACT_CACHE_TIMEOUT
+from .yaml_editor import load_yaml
+
+
+def count_hosts(inventory: Path) -> int:
+    """Count the distinct hosts of an inventory file."""
+    data = load_yaml(inventory) or {}
+    return len({host for group in data.values() for host in ((group or {}).get("hosts") or {})})
+
+
+def get_ansible_env(inventory: Path, strategy: Optional[str] = None) -> dict[str, str]:
+    """Get the environment for an ansible-playbook run against an inventory.
+
+    On top of ansible.cfg:
+    - one fork per host of the inventory, so no host waits for a worker
+    - smart gathering with a jsonfile fact cache in FACT_CACHE_DIR: facts are
+      gathered once per host and FACT_CACHE_TIMEOUT, not in every play of
+      every run
+    - the given strategy, if any (the Provisioner's adduser.yaml runs use
+      "free": their hosts are configured independently)
+
+    Variables already set in the environment win, so an admin can still
+    override any of these for one run (e.g. ANSIBLE_STRATEGY=linear).
+
+    Args:
+        inventory: Inventory file the playbook runs with
+        strategy: Default strategy plugin of the run (ansible.cfg's otherwise)
+
+    Returns:
+        Environment for the ansible-playbook process
+    """
+    overlay = {
+        "ANSIBLE_FORKS": str(max(1, count_hosts(inventory))),
+        "ANSIBLE_GATHERING": "smart",
+        "ANSIBLE_CACHE_PLUGIN": "jsonfile",
+        "ANSIBLE_CACHE_PLUGIN_CONNECTION": str(FACT_CACHE_DIR),
+        "ANSIBLE_CACHE_PLUGIN_TIMEOUT": str(FACT_CACHE_TIMEOUT),
+    }
+    if strategy:
+        overlay["ANSIBLE_STRATEGY"] = strategy
+    return {**overlay, **os.environ}
+
+
+def forget_facts(hosts: list[str]) -> None:
+    """Drop the cached facts of hosts, e.g. removed VMs whose name may be reused."""
+    for host in hosts:
+        (FACT_CACHE_DIR / host).unlink(missing_ok=True)
@@ -0,0 +1,263 @@
+"""Hypervisor CPU/RAM accounting for tenant VMs."""
+
+import re
+from typing import Any
+
+from .config import HOST_VARS_RESTSRV01, KVM_PROVISION_DEFAULTS, get_host_vars_path
+from .models import CPUPinning, HostCapacity, VMResources
+from .profiling import span
+from .yaml_editor import load_yaml
+
+
+def get_default_resources() -> VMResources:
+    """Get the VM size kvm_provision uses when host_vars don't set one."""
+    defaults = load_yaml(KVM_PROVISION_DEFAULTS) or {}
+    return VMResources(vcpus=int(defaults.get("vm_vcpus", 8)), ram_mb=int(defaults.get("vm_ram_mb", 8192)))
+
+
+def get_host_capacity(srv_data: Any) -> HostCapacity | None:
+    """Get the configured host capacity.
+
+    Args:
+        srv_data: Loaded host_vars/restsrv01.yaml
+
+    Returns:
+        HostCapacity, or None if host_capacity is not configured
+
+    Raises:
+        ValueError: If host_capacity is malformed
+    """
+    data = srv_data.get("host_capacity")
+    if not data:
+        return None
+    return HostCapacity.model_validate(dict(data))
+
+
+def get_vm_resources(data: Any, defaults: VMResources) -> VMResources:
+    """Get a VM's size from its host_vars document, falling back to defaults."""
+    data = data or {}
+    return VMResources(
+        vcpus=int(data.get("vm_vcpus", defaults.vcpus)),
+        ram_mb=int(data.get("vm_ram_mb", defaults.ram_mb)),
+    )
+
+
+def get_committed(srv_data: Any) -> dict[str, VMResources]:
+    """Get the size of every VM defined on the host.
+
+    Args:
+        srv_data: Loaded host_vars/restsrv01.yaml
+
+    Returns:
+        Dictionary mapping VM name to its resources, in vms order
+    """
+    defaults = get_default_resources()
+    committed = {}
+    with span("resource scan"):
+        for vm_name in srv_data.get("vms") or []:
+            path = get_host_vars_path(vm_name)
+            data = load_yaml(path) if path.exists() else None
+            committed[vm_name] = get_vm_resources(data, defaults)
+    return committed
+
+
+def check_overcommit(srv_data: Any, new_vms: list[VMResources]) -> list[str]:
+    """Check whether adding VMs exceeds the host's overcommit limits.
+
+    Args:
+        srv_data: Loaded host_vars/restsrv01.yaml
+        new_vms: Resources of the VMs to add
+
+    Returns:
+        One message per exceeded limit (empty if within limits or unconfigured)
+    """
+    capacity = get_host_capacity(srv_data)
+    if capacity is None:
+        return []
+
+    committed = list(get_committed(srv_data).values()) + new_vms
+    vcpus = sum(vm.vcpus for vm in committed)
+    ram_mb = sum(vm.ram_mb for vm in committed)
+    vcpu_limit = int(capacity.vcpus * capacity.vcpu_overcommit)
+    ram_limit = int(capacity.ram_mb * capacity.ram_overcommit)
+
+    problems = []
+    if vcpus > vcpu_limit:
+        problems.append(
+            f"vCPUs would be {vcpus} of {vcpu_limit} allowed "
+            f"({capacity.vcpus} x {capacity.vcpu_overcommit:g} overcommit)"
+        )
+    if ram_mb > ram_limit:
+        problems.append(
+            f"RAM would be {ram_mb} MiB of {ram_limit} MiB allowed "
+            f"({capacity.ram_mb} MiB x {capacity.ram_overcommit:g} overcommit)"
+        )
+    return problems
+
+
+def get_capacity_status() -> dict:
+    """Get committed vs available host resources.
+
+    Returns:
+        Dictionary with the capacity (None if unconfigured), committed
+        totals, limits, hugepage pool usage and the per-VM resources
+    """
+    srv_data = load_yaml(HOST_VARS_RESTSRV01)
+    capacity = get_host_capacity(srv_data)
+    vms = get_committed(srv_data)
+
+    usage = get_hugepage_usage(srv_data)
+    status = {
+        "capacity": capacity,
+        "vms": vms,
+        "vcpus": sum(vm.vcpus for vm in vms.values()),
+        "ram_mb": sum(vm.ram_mb for vm in vms.values()),
+        # size -> (pages reserved, pages used)
+        "hugepages": {
+            size: (count, sum(usage.get(size, {}).values()))
+            for size, count in ({s: 0 for s in usage} | get_hugepage_pool(srv_data)).items()
+        },
+    }
+    if capacity:
+        status["vcpu_limit"] = int(capacity.vcpus * capacity.vcpu_overcommit)
+        status["ram_limit"] = int(capacity.ram_mb * capacity.ram_overcommit)
+    return status
+
+
+def parse_cpu_list(spec: str) -> list[int]:
+    """Parse a Linux CPU list like "0-3,8,10-11".
+
+    Raises:
+        ValueError: If the list is malformed
+    """
+    cpus: list[int] = []
+    for part in str(spec).replace(" ", "").split(","):
+        if not part:
+            continue
+        match = re.fullmatch(r"(\d+)(?:-(\d+))?", part)
+        if not match:
+            raise ValueError(f"Invalid CPU list '{spec}'")
+        first, last = int(match.group(1)), int(match.group(2) or match.group(1))
+        cpus += range(first, last + 1)
+    return cpus
+
+
+def get_pinned_cpus(srv_data: Any) -> dict[int, list[str]]:
+    """Map every host CPU pinned to a VM (vm_cpus in host_vars) to its VMs.
+
+    Args:
+        srv_data: Loaded host_vars/restsrv01.yaml
+
+    Returns:
+        Dictionary mapping host CPU to the VMs pinned to it
+    """
+    pinned: dict[int, list[str]] = {}
+    for vm_name in srv_data.get("vms") or []:
+        path = get_host_vars_path(vm_name)
+        data = load_yaml(path) if path.exists() else None
+        for cpu in (data or {}).get("vm_cpus") or []:
+            pinned.setdefault(int(cpu), []).append(vm_name)
+    return pinned
+
+
+def get_pf_numa_node(srv_data: Any, pf: str) -> int | None:
+    """Get the NUMA node of an SR-IOV PF (numa_node of its sriov entry)."""
+    for pool in srv_data.get("sriov") or []:
+        if pool.get("pf_iface") == pf and pool.get("numa_node") is not None:
+            return int(pool["numa_node"])
+    return None
+
+
+def allocate_cpus(srv_data: Any, count: int, numa_node: int | None = None) -> CPUPinning | None:
+    """Allocate dedicated host CPUs for a VM on one NUMA node.
+
+    Args:
+        srv_data: Loaded host_vars/restsrv01.yaml
+        count: Number of CPUs (one per vCPU)
+        numa_node: Node to allocate on (default: the node with most free CPUs)
+
+    Returns:
+        CPUPinning with the lowest free CPUs of the node, or None if it has too few
+
+    Raises:
+        ValueError: If host_capacity has no numa_nodes or the node is unknown
+    """
+    capacity = get_host_capacity(srv_data)
+    if capacity is None or not capacity.numa_nodes:
+        raise ValueError("CPU pinning needs host_capacity.numa_nodes in host_vars/restsrv01.yaml")
+
+    taken = set(get_pinned_cpus(srv_data)) | set(parse_cpu_list(capacity.reserved_cpus))
+    free = {node: [cpu for cpu in parse_cpu_list(spec) if cpu not in taken] for node, spec in capacity.numa_nodes.items()}
+
+    if numa_node is None:
+        numa_node = max(free, key=lambda node: len(free[node]))
+    elif numa_node not in free:
+        raise ValueError(f"NUMA node {numa_node} is not in host_capacity.numa_nodes")
+
+    if len(free[numa_node]) < count:
+        return None
+    return CPUPinning(numa_node=numa_node, cpus=free[numa_node][:count])
+
+
+def find_cpu_conflicts(srv_data: Any) -> list[str]:
+    """Find host CPUs pinned to several VMs or reserved for the host."""
+    pinned = get_pinned_cpus(srv_data)
+    capacity = get_host_capacity(srv_data)
+    reserved = set(parse_cpu_list(capacity.reserved_cpus)) if capacity else set()
+
+    problems = []
+    for cpu, vms in sorted(pinned.items()):
+        if len(vms) > 1:
+            problems.append(f"CPU {cpu} is pinned to {', '.join(vms)}")
+        if cpu in reserved:
+            problems.append(f"CPU {cpu} of {', '.join(vms)} is in host_capacity.reserved_cpus")
+    return problems
+
+
+# Hugepage sizes a VM can be backed by, in MiB
+HUGEPAGE_SIZES_MB = {"2M": 2, "1G": 1024}
+
+
+def get_hugepage_pool(srv_data: Any) -> dict[str, int]:
+    """Get the hugepages reserved on the host per size (host_hugepages), e.g. {"1G": 64}."""
+    return {str(size): int(count) for size, count in (srv_data.get("host_hugepages") or {}).items()}
+
+
+def get_hugepage_usage(srv_data: Any) -> dict[str, dict[str, int]]:
+    """Get the hugepages used by every hugepage-backed VM.
+
+    Args:
+        srv_data: Loaded host_vars/restsrv01.yaml
+
+    Returns:
+        Dictionary mapping page size to {VM name: pages}
+    """
+    defaults = get_default_resources()
+    usage: dict[str, dict[str, int]] = {}
+    for vm_name in srv_data.get("vms") or []:
+        path = get_host_vars_path(vm_name)
+        data = load_yaml(path) if path.exists() else None
+        size = (data or {}).get("vm_hugepages")
+        if size in HUGEPAGE_SIZES_MB:
+            ram_mb = get_vm_resources(data, defaults).ram_mb
+            usage.setdefault(size, {})[vm_name] = -(-ram_mb // HUGEPAGE_SIZES_MB[size])
+    return usage
+
+
+def check_hugepages(srv_data: Any, size: str, ram_mb: int) -> str | None:
+    """Check that a VM of ram_mb fits in the free hugepages of a size.
+
+    Returns:
+        Why it does not fit, or None if it does
+    """
+    if size not in HUGEPAGE_SIZES_MB:
+        return f"Invalid hugepage size '{size}' (expected {' or '.join(HUGEPAGE_SIZES_MB)})"
+    if ram_mb % HUGEPAGE_SIZES_MB[size]:
+        return f"RAM ({ram_mb} MiB) is not a multiple of the {size} page size"
+
+    pool = get_hugepage_pool(srv_data).get(size, 0)
+    used = sum(get_hugepage_usage(srv_data).get(size, {}).values())
+    needed = ram_mb // HUGEPAGE_SIZES_MB[size]
+    if used + needed > pool:
+        return f"Needs {needed} {size} hugepages, {max(pool - used, 0)} of {pool} free (host_hugepages)"
+    return None
@@ -1,8 +1,11 @@
 """Typer CLI commands for p4tenant."""
 
 import getpass
+import json
 import os
 import subprocess
+import sys
+from pathlib import Path
 from typing import Optional
 
 import typer
@@ -10,21 +13,57 @@ from pydantic import ValidationError as PydanticValidationError
 from rich.panel import Panel
 from rich.prompt import Confirm, IntPrompt, Prompt
 
-from .config import BASE_DIR, HOST_VARS_RESTSRV01, get_vm_name
+from .ansible_env import forget_facts, get_ansible_env
+from .capacity import (
+    check_overcommit,
+    get_capacity_status,
+    get_default_resources,
+    get_host_capacity,
+    get_pf_numa_node,
+)
+from .config import (
+    BASE_DIR,
+    DEFAULT_CONCURRENCY,
+    HOST_VARS_RESTSRV01,
+    LOG_DIR,
+    INVENTORY_ADMIN,
+    SERVER_HOST,
+    VM_SNAPSHOT_NAME,
+    get_vm_name,
+)
+from .doctor import apply_fixes, run_checks
+from .index import RepoIndex
 from .yaml_editor import load_yaml
-from .inventory import (
-    create_minimal_inventory,
-    get_admin_users,
-    remove_from_admin_inventories,
-    sync_admin_inventory,
+from .inventory import build_dynamic_inventory, create_minimal_inventory, get_admin_users
+from .ip_allocator import allocate_ip_pairs, get_ip_status, get_ip_to_vm_mapping
+from .metrics import (
+    TRACKED_COMMANDS,
+    append_record,
+    build_record,
+    load_records,
+    run_metrics,
+    to_prometheus,
+    write_textfile,
 )
-from .ip_allocator import allocate_ip_pair, get_ip_status, get_ip_to_vm_mapping
-from .models import TenantInput
-from .tenant import TenantManager
+from .models import TenantInput, VMResources
+from .plan import Plan, StalePlanError, apply_plan, load_plan, save_plan, stale_inputs
+from .pool import get_pending_claim, get_pool_size, get_pool_status, list_pool_vms
+from .profiling import profiler, span
+from .provision import provision_vms
+from .sriov_allocator import get_sriov_status, parse_sriov_request
+from .tenant import TenantManager, ValidationError
 from .ui import (
     console,
+    create_capacity_table,
     create_ip_status_table,
+    create_issues_table,
+    create_metrics_table,
+    create_pool_table,
+    create_profile_table,
+    create_sriov_status_table,
     create_tenant_table,
+    create_vf_assignment_table,
+    create_vm_resources_table,
     print_changes_panel,
     print_error,
     print_info,
@@ -46,6 +85,104 @@ add_app = typer.Typer(
 )
 app.add_typer(add_app, name="add")
 
+# Create 'plan' subcommand group
+plan_app = typer.Typer(
+    name="plan",
+    help="Compute changes into a plan file for later review and apply-plan",
+    no_args_is_help=True,
+)
+app.add_typer(plan_app, name="plan")
+
+# Create 'pool' subcommand group
+pool_app = typer.Typer(
+    name="pool",
+    help="Manage the warm pool of pre-provisioned VMs",
+    no_args_is_help=True,
+)
+app.add_typer(pool_app, name="pool")
+
+
+@app.callback()
+def main(
+    ctx: typer.Context,
+    profile: bool = typer.Option(
+        False, "--profile", envvar="P4TENANT_PROFILE",
+        help="Print a per-phase timing breakdown when the command finishes",
+    ),
+    profile_output: Optional[Path] = typer.Option(
+        None, "--profile-output", envvar="P4TENANT_PROFILE_OUTPUT",
+        help="Write the profile to FILE (.json for spans, .pstats for cProfile)",
+    ),
+    profile_cprofile: bool = typer.Option(
+        False, "--profile-cprofile", envvar="P4TENANT_PROFILE_CPROFILE",
+        help="Also collect function-level statistics with cProfile",
+    ),
+    profile_memory: bool = typer.Option(
+        False, "--profile-memory", envvar="P4TENANT_PROFILE_MEMORY",
+        help="Also track peak memory per phase with tracemalloc",
+    ),
+) -> None:
+    """CLI tool for managing P4-RESTART tenants."""
+    profiler.start(
+        enabled=profile or profile_cprofile or profile_memory,
+        output=profile_output,
+        use_cprofile=profile_cprofile,
+        memory=profile_memory,
+    )
+    profiler.root.name = f"p4tenant {ctx.invoked_subcommand}"
+    ctx.call_on_close(finish_run)
+
+
+@add_app.callback()
+def add_main(ctx: typer.Context) -> None:
+    """Add new users or VMs."""
+    profiler.root.name = f"p4tenant add {ctx.invoked_subcommand}"
+
+
+@plan_app.callback()
+def plan_main(ctx: typer.Context) -> None:
+    """Compute changes into a plan file for later review and apply-plan."""
+    profiler.root.name = f"p4tenant plan {ctx.invoked_subcommand}"
+
+
+@pool_app.callback()
+def pool_main(ctx: typer.Context) -> None:
+    """Manage the warm pool of pre-provisioned VMs."""
+    profiler.root.name = f"p4tenant pool {ctx.invoked_subcommand}"
+
+
+def finish_run() -> None:
+    """Stop the profiler, record run metrics and print the profile."""
+    profiler.stop()
+
+    command = profiler.root.name.removeprefix("p4tenant ")
+    if command in TRACKED_COMMANDS:
+        # Called while the context closes, so a pending typer.Exit is visible here
+        exc = sys.exc_info()[1]
+        if exc is None:
+            exit_code = 0
+        else:
+            exit_code = getattr(exc, "exit_code", 1)
+        record = build_record(command, profiler.root.total, profiler.phase_durations(), exit_code)
+        try:
+            append_record(record)
+        except OSError as e:
+            print_warning(f"Could not record metrics: {e}")
+
+    if not profiler.enabled:
+        return
+
+    console.print()
+    console.print(create_profile_table(profiler.root.to_dict()))
+
+    cprofile_text = profiler.cprofile_text()
+    if cprofile_text and profiler.output is None:
+        console.print(cprofile_text, markup=False, highlight=False)
+
+    if profiler.output is not None:
+        profiler.write(profiler.output)
+        print_info(f"Profile written to {profiler.output}")
+
 # Help texts for interactive prompts
 HELP_ADMIN_USER = """[bold cyan]Admin User[/bold cyan]
 Your SSH username for accessing restsrv01.polito.it.
@@ -54,8 +191,9 @@ This is used for:
   - ProxyCommand for VM access
   - Running ansible playbooks
 
-Each admin has their own inventory file (inventory-{username}.yaml)
-that will be kept in sync when adding/removing tenants."""
+Connection settings per admin live in admins.yaml. Existing admin
+inventory files (inventory-{username}.yaml) are regenerated when
+adding/removing tenants; dynamic-inventory/p4tenant.sh needs none."""
 
 HELP_TENANT_USERNAME = """[bold cyan]Tenant Username[/bold cyan]
 The username for the new P4-RESTART tenant.
@@ -367,20 +505,284 @@ def prompt_vm_selection(vms: list[str]) -> list[str]:
     return [vms[i] for i in sorted(selected)]
 
 
+def validate_new_user(manager: TenantManager, username: str, email: str | None, num_vms: int) -> TenantInput:
+    """Validate a new tenant, printing errors and exiting if it can't be created."""
+    with span("validate"):
+        try:
+            tenant = TenantInput(username=username, email=email if email else None)
+        except PydanticValidationError as e:
+            for error in e.errors():
+                print_error(error["msg"])
+            raise typer.Exit(1)
+
+        # Check if tenant already exists
+        errors = manager.validate_new_tenant(tenant.username, num_vms)
+
+    if errors:
+        for error in errors:
+            print_error(error)
+        raise typer.Exit(1)
+
+    print_success(f"Username '{tenant.username}' is available")
+    return tenant
+
+
+def validate_new_vm_name(manager: TenantManager, vm_name: str) -> None:
+    """Validate a new VM name, printing errors and exiting if it is taken."""
+    with span("validate"):
+        errors = manager.validate_new_vm(vm_name)
+    if errors:
+        for error in errors:
+            print_error(error)
+        raise typer.Exit(1)
+
+    print_success(f"VM name '{vm_name}' is available")
+
+
+def check_capacity(new_vms: list[VMResources], allow_overcommit: bool = False) -> None:
+    """Check the host can take new VMs, exiting if it would be overcommitted.
+
+    Exceeding a limit is only a warning with --allow-overcommit or when
+    host_capacity sets on_overcommit: warn.
+    """
+    with span("capacity"):
+        srv_data = load_yaml(HOST_VARS_RESTSRV01)
+        try:
+            capacity = get_host_capacity(srv_data)
+            problems = check_overcommit(srv_data, new_vms)
+        except (ValueError, PydanticValidationError) as e:
+            print_error(f"Invalid host_capacity in host_vars/restsrv01.yaml: {e}")
+            raise typer.Exit(1)
+
+    if not problems:
+        return
+    if allow_overcommit or capacity.on_overcommit == "warn":
+        for problem in problems:
+            print_warning(f"Overcommit: {problem}")
+        return
+
+    for problem in problems:
+        print_error(f"Overcommit: {problem}")
+    print_info("Use smaller --vcpus/--ram, free resources, or pass --allow-overcommit")
+    raise typer.Exit(1)
+
+
+def get_vm_resources_option(vcpus: int | None, ram: int | None) -> VMResources | None:
+    """Get the resources requested with --vcpus/--ram (None if neither is given)."""
+    if vcpus is None and ram is None:
+        return None
+    if (vcpus is not None and vcpus < 1) or (ram is not None and ram < 256):
+        print_error("--vcpus must be at least 1 and --ram at least 256 MiB")
+        raise typer.Exit(1)
+    defaults = get_default_resources()
+    return VMResources(vcpus=vcpus or defaults.vcpus, ram_mb=ram or defaults.ram_mb)
+
+
+def plan_add_user(
+    manager: TenantManager,
+    tenant: TenantInput,
+    num_vms: int,
+    admin: str,
+    allow_overcommit: bool = False,
+    pool_vms: list[str] | None = None,
+) -> Plan:
+    """Allocate IPs for a new tenant's VMs (other than claimed pool VMs) and plan all changes once."""
+    pool_vms = pool_vms or []
+    num_new = num_vms - len(pool_vms)
+    check_capacity([get_default_resources()] * num_new, allow_overcommit)
+
+    for pool_vm in pool_vms:
+        print_success(f"Claiming warm pool VM '{pool_vm}'")
+
+    with span("allocate ips"):
+        ip_allocations = allocate_ip_pairs(num_new) if num_new else []
+    if ip_allocations is None:
+        print_error(f"Not enough IP addresses available for {num_new} VM(s)")
+        raise typer.Exit(1)
+
+    if num_new == 1:
+        print_success(f"Allocated IPs: {ip_allocations[0].ip1}, {ip_allocations[0].ip2}")
+    elif num_new > 1:
+        print_success(f"Allocated IPs for {num_new} VMs:")
+        for i, ip_alloc in enumerate(ip_allocations, len(pool_vms) + 1):
+            console.print(f"  VM {i}: {ip_alloc.ip1}, {ip_alloc.ip2}")
+
+    with span("plan"):
+        return manager.plan_add_tenant(tenant, ip_allocations, admin, pool_vms)
+
+
+def plan_add_vm(
+    manager: TenantManager,
+    username: str,
+    vm_name: str,
+    admin: str,
+    sriov: str | None = None,
+    resources: VMResources | None = None,
+    allow_overcommit: bool = False,
+    pin: bool = False,
+    hugepages: str | None = None,
+    mtu: int | None = None,
+) -> Plan:
+    """Allocate IPs (and SR-IOV VFs) for a new VM and plan all changes once."""
+    check_capacity([resources or get_default_resources()], allow_overcommit)
+
+    sriov_request = None
+    if sriov:
+        try:
+            sriov_request = parse_sriov_request(sriov)
+        except ValueError as e:
+            print_error(str(e))
+            raise typer.Exit(1)
+
+    with span("allocate ips"):
+        ip_allocations = allocate_ip_pairs(1)
+    if ip_allocations is None:
+        print_error("No IP addresses available in the allowed range")
+        raise typer.Exit(1)
+
+    ip_alloc = ip_allocations[0]
+    print_success(f"Allocated IPs: {ip_alloc.ip1}, {ip_alloc.ip2}")
+
+    with span("plan"):
+        try:
+            plan = manager.plan_add_vm(
+                username,
+                vm_name,
+                ip_alloc,
+                admin,
+                sriov=sriov_request,
+                resources=resources,
+                pin=pin,
+                hugepages=hugepages.upper() if hugepages else None,
+                mtu=mtu,
+            )
+        except ValidationError as e:
+            print_error(str(e))
+            raise typer.Exit(1)
+
+    for vf_alloc in plan.vf_allocations.values():
+        print_success(f"Allocated SR-IOV VFs: {vf_alloc.label}")
+    if pin and sriov_request and get_pf_numa_node(load_yaml(HOST_VARS_RESTSRV01), sriov_request[0]) is None:
+        print_warning(f"NUMA node of {sriov_request[0]} is unknown (set numa_node in its sriov entry)")
+    return plan
+
+
+def write_plan_files(plan: Plan) -> None:
+    """Write a plan's file changes, exiting if its inputs changed meanwhile."""
+    with span("write"):
+        try:
+            apply_plan(plan)
+        except StalePlanError as e:
+            print_error(str(e))
+            print_info("Re-run the command to compute a fresh plan")
+            raise typer.Exit(1)
+
+
+def run_plan_ansible(
+    plan: Plan, before_files: bool = False, concurrency: int = DEFAULT_CONCURRENCY, force_bootstrap: bool = False
+) -> bool:
+    """Run the plan's ansible steps that belong before or after the file changes.
+
+    All VMs to provision are handed to the concurrent provisioner at once.
+
+    Returns:
+        True if every playbook succeeded
+    """
+    steps = [step for step in plan.ansible if step.before_files == before_files]
+    success = True
+
+    with span("ansible"):
+        for step in steps:
+            if step.playbook == "removeuser.yaml":
+                success &= run_ansible_remove_for_user(step.username, plan.admin, step.vm_names)
+
+        # One concurrent run per set of stages (all of them, or e.g. only those of pool VMs)
+        provision: dict[tuple[str, ...] | None, list[str]] = {}
+        for step in steps:
+            if step.playbook == "adduser.yaml":
+                provision.setdefault(tuple(step.tags) if step.tags else None, []).extend(step.vm_names)
+        claims = {step.vm_names[0]: step.pool_vm for step in steps if step.pool_vm}
+        for tags, vm_names in provision.items():
+            success &= run_provisioning(
+                vm_names, plan.admin, concurrency, force_bootstrap, list(tags) if tags else None, claims
+            )
+
+    return success
+
+
+def run_provisioning(
+    vm_names: list[str],
+    admin_user: str,
+    concurrency: int,
+    force_bootstrap: bool = False,
+    tags: list[str] | None = None,
+    claims: dict[str, str] | None = None,
+) -> bool:
+    """Provision VMs concurrently and report each VM's result.
+
+    Returns:
+        True if every VM was provisioned successfully
+    """
+    runs = provision_vms(vm_names, admin_user, concurrency, force_bootstrap, tags, claims)
+
+    console.print()
+    for run in runs:
+        if run.status == "ok":
+            print_success(f"{run.vm_name} provisioned in {run.elapsed:.0f}s")
+        else:
+            print_error(f"{run.vm_name} failed in play '{run.stage}' (exit {run.returncode}), log: {run.log_path}")
+    return all(run.status == "ok" for run in runs)
+
+
+def start_pool_refill(admin_user: str) -> None:
+    """Refill the warm pool in a background `p4tenant pool fill` process."""
+    LOG_DIR.mkdir(parents=True, exist_ok=True)
+    log_path = LOG_DIR / "pool-fill.log"
+    with open(log_path, "ab") as log:
+        subprocess.Popen(
+            [sys.executable, "-m", "p4tenant", "pool", "fill", "--yes", "--admin", admin_user],
+            cwd=str(BASE_DIR),
+            stdin=subprocess.DEVNULL,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+            start_new_session=True,  # keeps running after this command exits
+        )
+    print_info(f"Refilling the warm VM pool in the background, log: {log_path}")
+
+
+def get_default_admin_user() -> str:
+    """Get the admin used in non-interactive mode when --admin is not given."""
+    admins = get_admin_users()
+    return admins[0] if admins else "alessandro"
+
+
 @add_app.command("user")
 def add_user(
     username: Optional[str] = typer.Option(None, "--username", "-u", help="Username for the new tenant"),
     email: Optional[str] = typer.Option(None, "--email", "-e", help="Email address (optional)"),
     num_vms: Optional[int] = typer.Option(None, "--num-vms", "-n", help="Number of VMs to create (default: 1)"),
+    allow_overcommit: bool = typer.Option(
+        False, "--allow-overcommit", help="Only warn if the host's CPU/RAM limits would be exceeded"
+    ),
     admin: Optional[str] = typer.Option(None, "--admin", "-A", help="Admin user for SSH/ansible operations"),
     yes: bool = typer.Option(False, "--yes", "-y", help="Skip confirmation prompts"),
     run_ansible: bool = typer.Option(False, "--run-ansible", "-a", help="Run ansible-playbook after adding"),
+    concurrency: int = typer.Option(
+        DEFAULT_CONCURRENCY, "--concurrency", "-j", help="Maximum concurrent ansible-playbook processes"
+    ),
+    force_bootstrap: bool = typer.Option(
+        False, "--force-bootstrap", help="Re-run the bootstrap steps skipped by the hosts' state markers"
+    ),
+    use_pool: bool = typer.Option(
+        True, "--pool/--no-pool", help="Claim warm pool VMs (with --run-ansible) instead of creating new ones"
+    ),
 ) -> None:
     """Add a new user (tenant) with one or more VMs.
 
     Creates all necessary configuration for a new P4-RESTART tenant:
     - Adds user to restart_users list
-    - Creates VM configuration(s) with allocated IPs
+    - Creates VM configuration(s) with allocated IPs, or claims booted VMs
+      from the warm pool (with --run-ansible) and refills it in the background
     - Updates inventory files
     - Optionally runs ansible to provision the VM(s)
     """
@@ -399,9 +801,7 @@ def add_user(
     # Get admin user first
     if not admin:
         if yes:
-            # In non-interactive mode, try to get default admin
-            admins = get_admin_users()
-            admin = admins[0] if admins else "alessandro"
+            admin = get_default_admin_user()
         else:
             admin = prompt_admin_user()
 
@@ -431,57 +831,18 @@ def add_user(
     console.print()
     console.print("[dim]Validating...[/dim]")
 
-    try:
-        tenant = TenantInput(username=username, email=email if email else None)
-    except PydanticValidationError as e:
-        for error in e.errors():
-            print_error(error["msg"])
-        raise typer.Exit(1)
-
-    # Check if tenant already exists
     manager = TenantManager()
-    errors = manager.validate_new_tenant(tenant.username, num_vms)
+    tenant = validate_new_user(manager, username, email, num_vms)
+    run_metrics.set_tenant(tenant.username, num_vms)
 
-    if errors:
-        for error in errors:
-            print_error(error)
-        raise typer.Exit(1)
-
-    print_success(f"Username '{tenant.username}' is available")
+    # A claimed pool VM is renamed by ansible, so only claim if it runs now
+    pool_vms = list_pool_vms(load_yaml(HOST_VARS_RESTSRV01), ready=True)[:num_vms] if use_pool and run_ansible else []
 
-    # Allocate IPs for all VMs
-    ip_allocations = []
-    for i in range(num_vms):
-        ip_alloc = allocate_ip_pair()
-        if not ip_alloc:
-            print_error(f"No IP addresses available for VM {i + 1}")
-            raise typer.Exit(1)
-        ip_allocations.append(ip_alloc)
+    # Allocate IPs for all VMs and plan the changes once
+    plan = plan_add_user(manager, tenant, num_vms, admin, allow_overcommit, pool_vms)
 
-    if num_vms == 1:
-        print_success(f"Allocated IPs: {ip_allocations[0].ip1}, {ip_allocations[0].ip2}")
-    else:
-        print_success(f"Allocated IPs for {num_vms} VMs:")
-        for i, ip_alloc in enumerate(ip_allocations, 1):
-            console.print(f"  VM {i}: {ip_alloc.ip1}, {ip_alloc.ip2}")
-
-    # Show planned changes
     console.print()
-    changes = manager.add_tenant(tenant, ip_allocations, dry_run=True)
-
-    # Add admin inventory sync to changes display
-    admin_inv_path = BASE_DIR / f"inventory-{admin}.yaml"
-    admins = get_admin_users()
-    main_admin = admins[0] if admins else "alessandro"
-    for vm_num in range(1, num_vms + 1):
-        vm_name = get_vm_name(tenant.username, vm_num)
-        if admin != main_admin:
-            if admin_inv_path.exists():
-                changes.append((f"inventory-{admin}.yaml", f"Add '{vm_name}' to vms.hosts"))
-            else:
-                changes.append((f"inventory-{admin}.yaml", f"[NEW] Create with '{vm_name}'"))
-
-    print_changes_panel(changes)
+    print_changes_panel(plan.changes)
 
     # Confirm
     if not yes:
@@ -493,15 +854,7 @@ def add_user(
     # Apply changes
     console.print()
     console.print("[dim]Applying changes...[/dim]")
-    manager.add_tenant(tenant, ip_allocations, dry_run=False)
-
-    # Sync admin-specific inventory for all VMs
-    for vm_num in range(1, num_vms + 1):
-        vm_name = get_vm_name(tenant.username, vm_num)
-        synced_inv = sync_admin_inventory(admin, vm_name)
-        if synced_inv:
-            print_success(f"Synced {synced_inv.name}")
-
+    write_plan_files(plan)
     print_success("All changes applied successfully")
 
     # Run ansible if requested
@@ -515,26 +868,43 @@ def add_user(
 
     if should_run:
         console.print()
-        # Run ansible for each VM
-        for vm_num in range(1, num_vms + 1):
-            vm_name = get_vm_name(tenant.username, vm_num)
-            if num_vms > 1:
-                console.print(f"[bold]Provisioning {vm_name}...[/bold]")
-            run_ansible_for_vm(vm_name, admin)
+        run_plan_ansible(plan, concurrency=concurrency, force_bootstrap=force_bootstrap)
+
+    # Claimed VMs keep vm_claimed_from in their host_vars until their vmclaim play succeeds
+    pending = [step.vm_names[0] for step in plan.ansible if step.pool_vm and get_pending_claim(step.vm_names[0])]
+    if pending:
+        print_warning(f"Claim of {', '.join(pending)} not finished, run 'p4tenant apply {tenant.username}' to retry")
+    elif pool_vms:
+        start_pool_refill(admin)
 
 
 @add_app.command("vm")
 def add_vm(
     username: Optional[str] = typer.Option(None, "--username", "-u", help="Username of the existing user"),
     vm_name: Optional[str] = typer.Option(None, "--vm-name", "-v", help="Name for the new VM"),
+    sriov: Optional[str] = typer.Option(None, "--sriov", help="Pass through N SR-IOV VFs of a PF, e.g. ens5f1:2"),
+    vcpus: Optional[int] = typer.Option(None, "--vcpus", help="vCPUs of the new VM (default: kvm_provision vm_vcpus)"),
+    ram: Optional[int] = typer.Option(None, "--ram", help="RAM of the new VM in MiB (default: kvm_provision vm_ram_mb)"),
+    pin: bool = typer.Option(False, "--pin", help="Pin vCPUs to dedicated host CPUs on one NUMA node"),
+    hugepages: Optional[str] = typer.Option(None, "--hugepages", help="Back the VM's memory with hugepages: 1G or 2M"),
+    mtu: Optional[int] = typer.Option(None, "--mtu", help="Dataplane MTU of the VM, up to group_vars dataplane_mtu"),
+    allow_overcommit: bool = typer.Option(
+        False, "--allow-overcommit", help="Only warn if the host's CPU/RAM limits would be exceeded"
+    ),
     admin: Optional[str] = typer.Option(None, "--admin", "-A", help="Admin user for SSH/ansible operations"),
     yes: bool = typer.Option(False, "--yes", "-y", help="Skip confirmation prompts"),
     run_ansible: bool = typer.Option(False, "--run-ansible", "-a", help="Run ansible-playbook after adding"),
+    concurrency: int = typer.Option(
+        DEFAULT_CONCURRENCY, "--concurrency", "-j", help="Maximum concurrent ansible-playbook processes"
+    ),
+    force_bootstrap: bool = typer.Option(
+        False, "--force-bootstrap", help="Re-run the bootstrap steps skipped by the hosts' state markers"
+    ),
 ) -> None:
     """Add a new VM for an existing user.
 
     Creates a new VM for a user who already exists in the system:
-    - Allocates new IP addresses for the VM
+    - Allocates new IP addresses (and, with --sriov, SR-IOV VFs) for the VM
     - Creates VM host_vars file
     - Updates inventory files
     - Optionally runs ansible to provision the VM
@@ -556,8 +926,7 @@ def add_vm(
     # Get admin user first
     if not admin:
         if yes:
-            admins = get_admin_users()
-            admin = admins[0] if admins else "alessandro"
+            admin = get_default_admin_user()
         else:
             admin = prompt_admin_user()
 
@@ -581,7 +950,8 @@ def add_vm(
             raise typer.Exit(1)
 
     # Verify user exists
-    user_info = manager.get_tenant_info(username)
+    with span("lookup"):
+        user_info = manager.get_tenant_info(username)
     if not user_info or not user_info.get("in_restart_users"):
         print_error(f"User '{username}' not found in restart_users")
         print_info("Use 'p4tenant add user' to create a new user first")
@@ -590,7 +960,8 @@ def add_vm(
     print_info(f"Selected user: [bold]{username}[/bold]")
 
     # Show existing VMs for this user
-    existing_vms = manager.get_user_vms(username)
+    with span("lookup"):
+        existing_vms = manager.get_user_vms(username)
     if existing_vms:
         console.print()
         console.print(f"[bold]Existing VMs for {username}:[/bold]")
@@ -601,7 +972,8 @@ def add_vm(
         console.print(f"[dim]No existing VMs found for {username}[/dim]")
 
     # Get or suggest VM name
-    suggested_name = manager.get_suggested_vm_name(username)
+    with span("lookup"):
+        suggested_name = manager.get_suggested_vm_name(username)
 
     if not vm_name:
         if yes:
@@ -617,37 +989,15 @@ def add_vm(
     console.print()
     console.print("[dim]Validating...[/dim]")
 
-    errors = manager.validate_new_vm(vm_name)
-    if errors:
-        for error in errors:
-            print_error(error)
-        raise typer.Exit(1)
-
-    print_success(f"VM name '{vm_name}' is available")
-
-    # Allocate IPs
-    ip_alloc = allocate_ip_pair()
-    if not ip_alloc:
-        print_error("No IP addresses available in the allowed range")
-        raise typer.Exit(1)
+    validate_new_vm_name(manager, vm_name)
+    run_metrics.set_tenant(username, 1)
 
-    print_success(f"Allocated IPs: {ip_alloc.ip1}, {ip_alloc.ip2}")
+    # Allocate IPs and plan the changes once
+    resources = get_vm_resources_option(vcpus, ram)
+    plan = plan_add_vm(manager, username, vm_name, admin, sriov, resources, allow_overcommit, pin, hugepages, mtu)
 
-    # Show planned changes
     console.print()
-    changes = manager.add_vm(username, vm_name, ip_alloc, dry_run=True)
-
-    # Add admin inventory sync to changes display
-    admin_inv_path = BASE_DIR / f"inventory-{admin}.yaml"
-    admins = get_admin_users()
-    main_admin = admins[0] if admins else "alessandro"
-    if admin != main_admin:
-        if admin_inv_path.exists():
-            changes.append((f"inventory-{admin}.yaml", f"Add '{vm_name}' to vms.hosts"))
-        else:
-            changes.append((f"inventory-{admin}.yaml", f"[NEW] Create with '{vm_name}'"))
-
-    print_changes_panel(changes)
+    print_changes_panel(plan.changes)
 
     # Confirm
     if not yes:
@@ -659,13 +1009,7 @@ def add_vm(
     # Apply changes
     console.print()
     console.print("[dim]Applying changes...[/dim]")
-    manager.add_vm(username, vm_name, ip_alloc, dry_run=False)
-
-    # Sync admin-specific inventory
-    synced_inv = sync_admin_inventory(admin, vm_name)
-    if synced_inv:
-        print_success(f"Synced {synced_inv.name}")
-
+    write_plan_files(plan)
     print_success("All changes applied successfully")
 
     # Run ansible if requested
@@ -679,7 +1023,7 @@ def add_vm(
 
     if should_run:
         console.print()
-        run_ansible_for_vm(vm_name, admin)
+        run_plan_ansible(plan, concurrency=concurrency, force_bootstrap=force_bootstrap)
 
 
 @app.command()
@@ -711,7 +1055,8 @@ def remove(
             print_error("Username is required in non-interactive mode")
             raise typer.Exit(1)
 
-        tenants = manager.list_all_tenants()
+        with span("lookup"):
+            tenants = manager.list_all_tenants()
         if not tenants:
             print_error("No tenants found")
             raise typer.Exit(1)
@@ -744,7 +1089,8 @@ def remove(
         console.print()
 
     # Check if tenant exists
-    info = manager.get_tenant_info(username)
+    with span("lookup"):
+        info = manager.get_tenant_info(username)
     if not info:
         print_error(f"Tenant '{username}' not found")
         raise typer.Exit(1)
@@ -761,7 +1107,8 @@ def remove(
     # === COLLECT ALL USER INPUT UPFRONT ===
 
     # 1. Find and select VMs to delete
-    tenant_vms = get_tenant_vms(username)
+    with span("lookup"):
+        tenant_vms = get_tenant_vms(username)
     selected_vms = []
 
     if tenant_vms:
@@ -774,6 +1121,7 @@ def remove(
             for vm in selected_vms:
                 console.print(f"  [green]✓[/green] {vm}")
 
+        run_metrics.set_tenant(username, len(selected_vms))
         if selected_vms:
             print_info(f"VMs to delete: {len(selected_vms)}")
         else:
@@ -782,18 +1130,13 @@ def remove(
         print_warning(f"No VMs found matching '{username}' in restsrv01.yaml")
 
     # 2. Show config file changes and ask about updating them
-    config_changes = manager.remove_tenant(username, vm_names=selected_vms, dry_run=True)
-    if config_changes:
-        # Add admin inventories that will be modified
-        for inv_file in BASE_DIR.glob("inventory-*.yaml"):
-            # Show removal for each selected VM
-            for selected_vm in selected_vms:
-                config_changes.append((inv_file.name, f"Remove '{selected_vm}' if present"))
+    with span("plan"):
+        plan = manager.plan_remove_tenant(username, vm_names=selected_vms, update_config=not skip_config)
 
     should_update_config = not skip_config
-    if config_changes and not skip_config:
+    if plan.changes and not skip_config:
         console.print()
-        print_changes_panel(config_changes)
+        print_changes_panel(plan.changes)
 
         if not yes:
             console.print()
@@ -806,8 +1149,7 @@ def remove(
     if run_ansible and selected_vms:
         if not admin:
             if yes:
-                admins = get_admin_users()
-                admin = admins[0] if admins else "alessandro"
+                admin = get_default_admin_user()
             else:
                 console.print()
                 admin = prompt_admin_user()
@@ -819,7 +1161,8 @@ def remove(
     # Run ansible removal playbook FIRST (default behavior)
     if run_ansible and selected_vms:
         console.print()
-        ansible_success = run_ansible_remove_for_user(username, admin, selected_vms)
+        plan.admin = admin
+        ansible_success = run_plan_ansible(plan, before_files=True)
         if not ansible_success:
             print_warning("Ansible playbook failed")
             if should_update_config and not yes:
@@ -835,14 +1178,7 @@ def remove(
     # Update configuration files
     if should_update_config:
         console.print("[dim]Removing tenant from configuration files...[/dim]")
-        manager.remove_tenant(username, vm_names=selected_vms, dry_run=False)
-
-        # Remove from admin inventories (for each selected VM)
-        for selected_vm in selected_vms:
-            modified_invs = remove_from_admin_inventories(selected_vm)
-            for inv_path in modified_invs:
-                print_success(f"Removed from {inv_path.name}")
-
+        write_plan_files(plan)
         print_success(f"Configuration files updated for '{username}'")
     else:
         print_info("Skipped configuration file updates")
@@ -852,70 +1188,81 @@ def remove(
 
 @app.command()
 def apply(
-    username: str = typer.Argument(..., help="Username of the tenant to provision"),
+    usernames: list[str] = typer.Argument(..., help="Username(s) of the tenants to provision"),
     admin: Optional[str] = typer.Option(None, "--admin", "-A", help="Admin user for SSH/ansible operations"),
     yes: bool = typer.Option(False, "--yes", "-y", help="Skip confirmation prompts"),
+    concurrency: int = typer.Option(
+        DEFAULT_CONCURRENCY, "--concurrency", "-j", help="Maximum concurrent ansible-playbook processes"
+    ),
+    force_bootstrap: bool = typer.Option(
+        False, "--force-bootstrap", help="Re-run the bootstrap steps skipped by the hosts' state markers"
+    ),
 ) -> None:
-    """Run ansible playbook for an existing tenant.
+    """Run ansible playbook for one or more existing tenants.
 
     Use this to:
-    - Provision a VM for a user already in the configuration
+    - Provision VMs for users already in the configuration
     - Re-run provisioning after configuration changes
-    - Apply updates to an existing tenant's VM
+    - Onboard a cohort: all VMs of all given tenants are provisioned
+      concurrently (at most --concurrency at once)
 
-    Uses a minimal inventory for fast execution.
+    Uses a minimal inventory per VM for fast execution.
     """
     console.print()
 
     manager = TenantManager()
+    vm_names: list[str] = []
+
+    for username in usernames:
+        # Check if tenant exists
+        with span("lookup"):
+            info = manager.get_tenant_info(username)
+        if not info:
+            print_error(f"Tenant '{username}' not found")
+            print_info("Use 'p4tenant add user' to create a new tenant first")
+            raise typer.Exit(1)
 
-    # Check if tenant exists
-    info = manager.get_tenant_info(username)
-    if not info:
-        print_error(f"Tenant '{username}' not found")
-        print_info("Use 'p4tenant add user' to create a new tenant first")
-        raise typer.Exit(1)
-
-    vm_name = info.get("vm_name", get_vm_name(username, 1))
-    print_info(f"Tenant: {username} (VM: {vm_name})")
-
-    if info["ips"]:
-        print_info(f"IPs: {', '.join(info['ips'])}")
-
-    # Show configuration status
-    status_parts = []
-    if info["in_restart_users"]:
-        status_parts.append("[green]restart_users[/green]")
-    if info["in_vms_list"]:
-        status_parts.append("[green]vms list[/green]")
-    if info["in_inventory"]:
-        status_parts.append("[green]inventory[/green]")
-    if info["has_host_vars"]:
-        status_parts.append("[green]host_vars[/green]")
-
-    if status_parts:
-        print_info(f"Config: {', '.join(status_parts)}")
-
-    # Check for missing configuration
-    missing = []
-    if not info["in_restart_users"]:
-        missing.append("restart_users")
-    if not info["in_vms_list"]:
-        missing.append("vms list")
-    if not info["in_inventory"]:
-        missing.append("inventory")
-    if not info["has_host_vars"]:
-        missing.append("host_vars")
-
-    if missing:
-        print_warning(f"Missing config: {', '.join(missing)}")
-        print_info("Consider running 'p4tenant add user' to complete the configuration")
+        vm_names += info["vm_names"]
+        print_info(f"Tenant: {username} (VMs: {', '.join(info['vm_names'])})")
+
+        if info["ips"]:
+            print_info(f"IPs: {', '.join(info['ips'])}")
+
+        # Show configuration status
+        status_parts = []
+        if info["in_restart_users"]:
+            status_parts.append("[green]restart_users[/green]")
+        if info["in_vms_list"]:
+            status_parts.append("[green]vms list[/green]")
+        if info["in_inventory"]:
+            status_parts.append("[green]inventory[/green]")
+        if info["has_host_vars"]:
+            status_parts.append("[green]host_vars[/green]")
+
+        if status_parts:
+            print_info(f"Config: {', '.join(status_parts)}")
+
+        # Check for missing configuration
+        missing = []
+        if not info["in_restart_users"]:
+            missing.append("restart_users")
+        if not info["in_vms_list"]:
+            missing.append("vms list")
+        if not info["in_inventory"]:
+            missing.append("inventory")
+        if not info["has_host_vars"]:
+            missing.append("host_vars")
+
+        if missing:
+            print_warning(f"Missing config: {', '.join(missing)}")
+            print_info("Consider running 'p4tenant add user' to complete the configuration")
+
+    run_metrics.set_tenant(",".join(usernames), len(vm_names))
 
     # Get admin user
     if not admin:
         if yes:
-            admins = get_admin_users()
-            admin = admins[0] if admins else "alessandro"
+            admin = get_default_admin_user()
         else:
             console.print()
             admin = prompt_admin_user()
@@ -925,13 +1272,295 @@ def apply(
     # Confirm
     if not yes:
         console.print()
-        if not Confirm.ask(f"[bold]Run ansible-playbook for '{username}'?[/bold]", default=True):
+        target = f"'{usernames[0]}'" if len(usernames) == 1 else f"{len(usernames)} tenants ({len(vm_names)} VMs)"
+        if not Confirm.ask(f"[bold]Run ansible-playbook for {target}?[/bold]", default=True):
             print_warning("Aborted")
             raise typer.Exit(0)
 
     # Run ansible
     console.print()
-    run_ansible_for_vm(vm_name, admin)
+    with span("ansible"):
+        if not run_provisioning(vm_names, admin, concurrency, force_bootstrap):
+            raise typer.Exit(1)
+
+
+@app.command()
+def flatten(
+    vm_names: list[str] = typer.Argument(..., help="VM(s) whose disk should stop depending on the base image"),
+    admin: Optional[str] = typer.Option(None, "--admin", "-A", help="Admin user for SSH/ansible operations"),
+    yes: bool = typer.Option(False, "--yes", "-y", help="Skip confirmation prompts"),
+) -> None:
+    """Turn linked-clone VM disks into independent full images.
+
+    New VMs get a qcow2 overlay on the shared base image. Flattening
+    copies the blocks still read from the base image into the VM's own
+    disk (live for running VMs), so the VM survives base image changes.
+
+    The post-provisioning snapshot used by `reset` still reads unwritten
+    blocks from the base image, so it is deleted first and taken again
+    afterwards: a reset after a flatten reverts to the flattened state.
+    """
+    console.print()
+
+    with span("lookup"):
+        srv_vms = load_yaml(HOST_VARS_RESTSRV01).get("vms", [])
+    unknown = [vm for vm in vm_names if vm not in srv_vms]
+    if unknown:
+        print_error(f"Not in restsrv01 vms: {', '.join(unknown)}")
+        raise typer.Exit(1)
+
+    if not admin:
+        admin = get_default_admin_user() if yes else prompt_admin_user()
+    print_info(f"Operating as admin: [bold]{admin}[/bold]")
+
+    if not yes:
+        console.print()
+        if not Confirm.ask(f"[bold]Flatten {', '.join(vm_names)}?[/bold]", default=True):
+            print_warning("Aborted")
+            raise typer.Exit(0)
+
+    console.print()
+    with span("ansible"):
+        ok = run_playbook("flatten-vm.yaml", admin, vm_name=vm_names[0], extra_vars={"flatten_vms": vm_names})
+    if not ok:
+        raise typer.Exit(1)
+
+
+@app.command()
+def reset(
+    vm_names: list[str] = typer.Argument(..., help="VM(s) to revert to their post-provisioning state"),
+    admin: Optional[str] = typer.Option(None, "--admin", "-A", help="Admin user for SSH/ansible operations"),
+    yes: bool = typer.Option(False, "--yes", "-y", help="Skip confirmation prompts"),
+) -> None:
+    """Revert VMs to the snapshot taken at the end of their provisioning.
+
+    Everything written to the VM since it was provisioned is lost. host_vars,
+    IPs and the inventory are untouched and no playbook runs: the snapshot is
+    reverted with virsh over SSH on restsrv01 and the VM is left running.
+
+    The snapshot is internal to the VM's linked-clone overlay and reads the
+    blocks the VM never wrote from the base image. `flatten` therefore
+    replaces it with a snapshot of the flattened disk, taken when it runs.
+    """
+    console.print()
+
+    with span("lookup"):
+        srv_vms = load_yaml(HOST_VARS_RESTSRV01).get("vms", [])
+    unknown = [vm for vm in vm_names if vm not in srv_vms]
+    if unknown:
+        print_error(f"Not in restsrv01 vms: {', '.join(unknown)}")
+        raise typer.Exit(1)
+
+    if not admin:
+        admin = get_default_admin_user() if yes else prompt_admin_user()
+    print_info(f"Operating as admin: [bold]{admin}[/bold]")
+
+    if not yes:
+        console.print()
+        if not Confirm.ask(f"[bold]Reset {', '.join(vm_names)}? All changes inside the VM are lost[/bold]", default=False):
+            print_warning("Aborted")
+            raise typer.Exit(0)
+
+    console.print()
+    failed = False
+    with span("revert"):
+        for vm_name in vm_names:
+            cmd = [
+                "ssh", f"{admin}@{SERVER_HOST}",
+                "virsh", "-c", "qemu:///system", "snapshot-revert", vm_name, VM_SNAPSHOT_NAME, "--running", "--force",
+            ]
+            try:
+                result = subprocess.run(cmd, capture_output=True, text=True)
+            except FileNotFoundError:
+                print_error("ssh not found")
+                raise typer.Exit(1)
+            if result.returncode == 0:
+                print_success(f"{vm_name} reset to its post-provisioning snapshot")
+            else:
+                failed = True
+                print_error(f"Could not reset {vm_name}: {result.stderr.strip() or f'exit {result.returncode}'}")
+
+    if failed:
+        print_info("VMs provisioned before snapshots existed have none: run 'p4tenant apply' to take one")
+        raise typer.Exit(1)
+
+
+@plan_app.command("add-user")
+def plan_add_user_command(
+    username: str = typer.Option(..., "--username", "-u", help="Username for the new tenant"),
+    output: Path = typer.Option(..., "--output", "-o", help="File to write the plan to (JSON)"),
+    email: Optional[str] = typer.Option(None, "--email", "-e", help="Email address (optional)"),
+    num_vms: int = typer.Option(1, "--num-vms", "-n", help="Number of VMs to create"),
+    allow_overcommit: bool = typer.Option(
+        False, "--allow-overcommit", help="Only warn if the host's CPU/RAM limits would be exceeded"
+    ),
+    admin: Optional[str] = typer.Option(None, "--admin", "-A", help="Admin user for SSH/ansible operations"),
+    run_ansible: bool = typer.Option(False, "--run-ansible", "-a", help="Run ansible-playbook when the plan is applied"),
+) -> None:
+    """Plan adding a new user (tenant) without changing any file."""
+    console.print()
+    admin = admin or get_default_admin_user()
+
+    manager = TenantManager()
+    tenant = validate_new_user(manager, username, email, num_vms)
+    plan = plan_add_user(manager, tenant, num_vms, admin, allow_overcommit)
+    plan.run_ansible = run_ansible
+    write_plan_file(plan, output)
+
+
+@plan_app.command("add-vm")
+def plan_add_vm_command(
+    username: str = typer.Option(..., "--username", "-u", help="Username of the existing user"),
+    output: Path = typer.Option(..., "--output", "-o", help="File to write the plan to (JSON)"),
+    vm_name: Optional[str] = typer.Option(None, "--vm-name", "-v", help="Name for the new VM (default: next free)"),
+    sriov: Optional[str] = typer.Option(None, "--sriov", help="Pass through N SR-IOV VFs of a PF, e.g. ens5f1:2"),
+    vcpus: Optional[int] = typer.Option(None, "--vcpus", help="vCPUs of the new VM (default: kvm_provision vm_vcpus)"),
+    ram: Optional[int] = typer.Option(None, "--ram", help="RAM of the new VM in MiB (default: kvm_provision vm_ram_mb)"),
+    pin: bool = typer.Option(False, "--pin", help="Pin vCPUs to dedicated host CPUs on one NUMA node"),
+    hugepages: Optional[str] = typer.Option(None, "--hugepages", help="Back the VM's memory with hugepages: 1G or 2M"),
+    mtu: Optional[int] = typer.Option(None, "--mtu", help="Dataplane MTU of the VM, up to group_vars dataplane_mtu"),
+    allow_overcommit: bool = typer.Option(
+        False, "--allow-overcommit", help="Only warn if the host's CPU/RAM limits would be exceeded"
+    ),
+    admin: Optional[str] = typer.Option(None, "--admin", "-A", help="Admin user for SSH/ansible operations"),
+    run_ansible: bool = typer.Option(False, "--run-ansible", "-a", help="Run ansible-playbook when the plan is applied"),
+) -> None:
+    """Plan adding a VM for an existing user without changing any file."""
+    console.print()
+    admin = admin or get_default_admin_user()
+
+    manager = TenantManager()
+    with span("lookup"):
+        user_info = manager.get_tenant_info(username)
+        if not vm_name:
+            vm_name = manager.get_suggested_vm_name(username)
+    if not user_info or not user_info.get("in_restart_users"):
+        print_error(f"User '{username}' not found in restart_users")
+        raise typer.Exit(1)
+
+    validate_new_vm_name(manager, vm_name)
+    resources = get_vm_resources_option(vcpus, ram)
+    plan = plan_add_vm(manager, username, vm_name, admin, sriov, resources, allow_overcommit, pin, hugepages, mtu)
+    plan.run_ansible = run_ansible
+    write_plan_file(plan, output)
+
+
+@plan_app.command("remove")
+def plan_remove_command(
+    username: str = typer.Argument(..., help="Username of the tenant to remove"),
+    output: Path = typer.Option(..., "--output", "-o", help="File to write the plan to (JSON)"),
+    vm_names: Optional[list[str]] = typer.Option(None, "--vm", help="Only remove this VM (repeatable, default: all)"),
+    admin: Optional[str] = typer.Option(None, "--admin", "-A", help="Admin user for SSH/ansible operations"),
+    skip_ansible: bool = typer.Option(False, "--skip-ansible", "-s", help="Don't run the removal playbook"),
+    skip_config: bool = typer.Option(False, "--skip-config", "-c", help="Don't update config files"),
+) -> None:
+    """Plan removing a tenant (or some of its VMs) without changing any file."""
+    console.print()
+
+    manager = TenantManager()
+    with span("lookup"):
+        if not manager.get_tenant_info(username):
+            print_error(f"Tenant '{username}' not found")
+            raise typer.Exit(1)
+        tenant_vms = get_tenant_vms(username)
+
+    unknown = [vm for vm in vm_names or [] if vm not in tenant_vms]
+    if unknown:
+        print_error(f"Not VMs of '{username}': {', '.join(unknown)}")
+        raise typer.Exit(1)
+
+    with span("plan"):
+        plan = manager.plan_remove_tenant(
+            username,
+            vm_names=vm_names or tenant_vms,
+            admin=admin or get_default_admin_user(),
+            update_config=not skip_config,
+        )
+    plan.run_ansible = not skip_ansible and bool(plan.ansible)
+    write_plan_file(plan, output)
+
+
+def write_plan_file(plan: Plan, output: Path) -> None:
+    """Save a plan and show what applying it will do."""
+    console.print()
+    print_plan(plan)
+    save_plan(plan, output)
+    console.print()
+    print_success(f"Plan written to {output}")
+    print_info(f"Review it, then run 'p4tenant apply-plan {output}'")
+
+
+def print_plan(plan: Plan) -> None:
+    """Print the file changes and ansible steps of a plan."""
+    if plan.changes:
+        print_changes_panel(plan.changes)
+    else:
+        print_info("No configuration file changes")
+
+    if plan.run_ansible:
+        for step in plan.ansible:
+            when = "before" if step.before_files else "after"
+            print_info(f"ansible: {step.playbook} for {', '.join(step.vm_names)} ({when} the file changes)")
+
+
+@app.command(name="apply-plan")
+def apply_plan_command(
+    plan_file: Path = typer.Argument(..., help="Plan file written by 'p4tenant plan'"),
+    yes: bool = typer.Option(False, "--yes", "-y", help="Skip confirmation prompts"),
+    concurrency: int = typer.Option(
+        DEFAULT_CONCURRENCY, "--concurrency", "-j", help="Maximum concurrent ansible-playbook processes"
+    ),
+    force_bootstrap: bool = typer.Option(
+        False, "--force-bootstrap", help="Re-run the bootstrap steps skipped by the hosts' state markers"
+    ),
+) -> None:
+    """Apply a plan file written by 'p4tenant plan'.
+
+    The plan is applied exactly as reviewed, without recomputing anything.
+    It is refused if any file it was computed from changed since.
+    """
+    console.print()
+
+    try:
+        plan = load_plan(plan_file)
+    except (OSError, ValueError) as e:
+        print_error(f"Could not read plan {plan_file}: {e}")
+        raise typer.Exit(1)
+
+    run_metrics.set_tenant(plan.username, len(plan.vm_names))
+    print_info(f"Plan: {plan.command} '{plan.username}' (admin {plan.admin}, created {plan.created})")
+
+    stale = stale_inputs(plan)
+    if stale:
+        print_error(f"Inputs changed since the plan was made: {', '.join(stale)}")
+        print_info("Compute a fresh plan with 'p4tenant plan'")
+        raise typer.Exit(1)
+
+    console.print()
+    print_plan(plan)
+
+    if not yes:
+        console.print()
+        if not Confirm.ask("[bold]Apply plan?[/bold]", default=False):
+            print_warning("Aborted")
+            raise typer.Exit(0)
+
+    console.print()
+    if plan.run_ansible and not run_plan_ansible(plan, before_files=True):
+        print_warning("Ansible playbook failed")
+        if plan.files and not yes:
+            console.print()
+            if not Confirm.ask("[bold]Continue with config file changes anyway?[/bold]", default=False):
+                print_warning("Aborted")
+                raise typer.Exit(1)
+
+    if plan.files:
+        console.print("[dim]Applying changes...[/dim]")
+        write_plan_files(plan)
+        print_success("All changes applied successfully")
+
+    if plan.run_ansible:
+        run_plan_ansible(plan, concurrency=concurrency, force_bootstrap=force_bootstrap)
 
 
 @app.command(name="list")
@@ -946,14 +1575,16 @@ def list_tenants() -> None:
     console.print()
 
     manager = TenantManager()
-    tenants = manager.list_all_tenants()
+    with span("scan"):
+        tenants = manager.list_all_tenants()
 
     if not tenants:
         print_info("No tenants found")
         raise typer.Exit(0)
 
-    table = create_tenant_table(tenants)
-    console.print(table)
+    with span("render"):
+        table = create_tenant_table(tenants)
+        console.print(table)
     console.print()
     console.print("[dim]Status legend: users=restart_users, vms=restsrv01, inv=inventory, host=host_vars file[/dim]")
     console.print(f"[dim]Total: {len(tenants)} tenant(s)[/dim]")
@@ -971,13 +1602,16 @@ def ip_status() -> None:
     """
     console.print()
 
-    status = get_ip_status()
-    table = create_ip_status_table(status)
-    console.print(table)
+    with span("scan"):
+        status = get_ip_status()
+    with span("render"):
+        table = create_ip_status_table(status)
+        console.print(table)
 
     # Show IP to VM mapping
     console.print()
-    ip_to_vm = get_ip_to_vm_mapping()
+    with span("scan"):
+        ip_to_vm = get_ip_to_vm_mapping()
 
     if ip_to_vm:
         from rich.table import Table
@@ -986,57 +1620,270 @@ def ip_status() -> None:
         mapping_table.add_column("IP Address", style="yellow")
         mapping_table.add_column("VM Name", style="cyan")
 
-        for ip in sorted(ip_to_vm.keys(), key=lambda x: int(x.split(".")[-1])):
-            mapping_table.add_row(ip, ip_to_vm[ip])
+        with span("render"):
+            for ip in sorted(ip_to_vm.keys(), key=lambda x: int(x.split(".")[-1])):
+                mapping_table.add_row(ip, ip_to_vm[ip])
 
-        console.print(mapping_table)
+            console.print(mapping_table)
 
 
-def run_ansible_for_vm(vm_name: str, admin_user: str) -> None:
-    """Run ansible-playbook for a single VM using minimal inventory.
+@app.command()
+def capacity() -> None:
+    """Show committed vs available CPU and RAM of restsrv01.
 
-    This creates a temporary inventory with only the necessary hosts,
-    making ansible execution much faster than running against all hosts.
+    Displays:
+    - Host capacity and overcommit limits (host_capacity in restsrv01.yaml)
+    - vCPUs and RAM committed to VMs, and what is left
+    - Hugepages reserved (host_hugepages) and used by hugepage-backed VMs
+    - Per-VM sizes (host_vars overrides or kvm_provision defaults)
+    """
+    console.print()
 
-    Args:
-        vm_name: Name of the VM to provision
-        admin_user: Admin username for SSH connections
+    with span("scan"):
+        try:
+            status = get_capacity_status()
+        except (ValueError, PydanticValidationError) as e:
+            print_error(f"Invalid host_capacity in host_vars/restsrv01.yaml: {e}")
+            raise typer.Exit(1)
+
+    with span("render"):
+        console.print(create_capacity_table(status))
+        console.print()
+        console.print(create_vm_resources_table(status["vms"]))
+
+    if status["capacity"] is None:
+        console.print()
+        print_warning("host_capacity is not set in host_vars/restsrv01.yaml, overcommit is not checked")
+
+
+@pool_app.command("fill")
+def pool_fill(
+    size: Optional[int] = typer.Argument(None, help="Number of unassigned VMs to keep (default: vm_pool_size)"),
+    admin: Optional[str] = typer.Option(None, "--admin", "-A", help="Admin user for SSH/ansible operations"),
+    yes: bool = typer.Option(False, "--yes", "-y", help="Skip confirmation prompts"),
+    allow_overcommit: bool = typer.Option(
+        False, "--allow-overcommit", help="Only warn if the host's CPU/RAM limits would be exceeded"
+    ),
+    concurrency: int = typer.Option(
+        DEFAULT_CONCURRENCY, "--concurrency", "-j", help="Maximum concurrent ansible-playbook processes"
+    ),
+) -> None:
+    """Create and boot generic VMs until the warm pool has SIZE of them.
+
+    Pool VMs (restvm-pool-NN) get dataplane IPs and are defined, booted and
+    bootstrapped without any tenant user. Once that succeeded (vm_pool_ready),
+    `add user --run-ansible` claims them, so onboarding only runs the per-user steps. SIZE is recorded as
+    vm_pool_size in host_vars/restsrv01.yaml for the background refills.
     """
-    playbook = BASE_DIR / "playbooks" / "adduser.yaml"
+    console.print()
+    admin = admin or get_default_admin_user()
 
-    # Create minimal inventory for this VM only
-    console.print("[dim]Creating minimal inventory for faster execution...[/dim]")
-    temp_inventory = create_minimal_inventory(vm_name, admin_user)
+    manager = TenantManager()
+    srv_data = load_yaml(HOST_VARS_RESTSRV01)
+    if size is None:
+        size = get_pool_size(srv_data)
+    if size < 0:
+        print_error("Pool size must be at least 0")
+        raise typer.Exit(1)
 
-    try:
-        cmd = [
-            "ansible-playbook",
-            str(playbook),
-            "-i",
-            str(temp_inventory),
-        ]
+    missing = max(size - len(list_pool_vms(srv_data)), 0)
+    check_capacity([get_default_resources()] * missing, allow_overcommit)
 
-        console.print(f"[dim]Running: {' '.join(cmd)}[/dim]")
-        console.print(f"[dim]Inventory: {temp_inventory}[/dim]")
+    with span("allocate ips"):
+        ip_allocations = allocate_ip_pairs(missing) if missing else []
+    if ip_allocations is None:
+        print_error(f"Not enough IP addresses available for {missing} pool VM(s)")
+        raise typer.Exit(1)
+
+    with span("plan"):
+        plan = manager.plan_fill_pool(ip_allocations, size, admin)
+
+    if not plan.changes and not plan.ansible:
+        print_success(f"Warm pool already has {size} VM(s)")
+        return
+
+    if plan.changes:
+        print_changes_panel(plan.changes)
+    else:
+        print_info(f"No configuration file changes, provisioning {len(plan.ansible)} pool VM(s) that are not ready")
+    if not yes:
         console.print()
+        if not Confirm.ask("[bold]Apply changes?[/bold]", default=False):
+            print_warning("Aborted")
+            raise typer.Exit(0)
 
-        result = subprocess.run(cmd, cwd=str(BASE_DIR))
+    if plan.changes:
+        console.print()
+        write_plan_files(plan)
+        print_success("All changes applied successfully")
 
-        if result.returncode != 0:
-            print_error(f"ansible-playbook exited with code {result.returncode}")
+    if plan.ansible:
+        console.print()
+        if not run_plan_ansible(plan, concurrency=concurrency):
+            raise typer.Exit(1)
+
+
+@pool_app.command("status")
+def pool_status() -> None:
+    """Show the warm pool's VMs and target size."""
+    console.print()
+
+    with span("scan"):
+        status = get_pool_status()
+
+    console.print(create_pool_table(status))
+    if len(status["ready"]) < status["size"]:
+        console.print()
+        print_info("Run 'p4tenant pool fill' to top the pool up")
+
+
+@app.command(name="sriov-status")
+def sriov_status() -> None:
+    """Show SR-IOV VF utilisation per PF.
+
+    Displays, for every PF declared in restsrv01 sriov:
+    - Which VFs are statically allocated (sriov_vf_allocation)
+    - VMs using the PF's libvirt pool (one VF each)
+    - Free VFs and the largest free contiguous range
+    """
+    console.print()
+
+    with span("scan"):
+        status = get_sriov_status()
+    if not status:
+        print_info("No SR-IOV PFs declared in host_vars/restsrv01.yaml")
+        raise typer.Exit(0)
+
+    with span("render"):
+        console.print(create_sriov_status_table(status))
+        console.print()
+        console.print(create_vf_assignment_table(status))
+
+
+@app.command()
+def doctor(
+    fix: bool = typer.Option(False, "--fix", help="Apply all automatic repairs in one transactional write"),
+    yes: bool = typer.Option(False, "--yes", "-y", help="Skip confirmation prompts"),
+) -> None:
+    """Check all configuration files for cross-file drift.
+
+    Loads restart_users, restsrv01 vms, inventory.yaml, the admin
+    inventories and every host_vars file once and reports:
+    - VMs missing from inventory.yaml or restsrv01 vms
+    - host_vars files without an inventory entry
+    - users without VMs and VM users missing from restart_users
+    - duplicate, invalid or out-of-range dataplane IPs
+    - admin inventories out of sync with inventory.yaml
+    - non-restvm hosts with addresses the allocator could hand out again
+
+    With --fix, all repairs are applied together; if any file fails to
+    write, every file is restored. Backups are created before writing.
+    """
+    console.print()
+
+    index = RepoIndex()
+    issues = run_checks(index)
+
+    if not issues:
+        print_success("No issues found")
+        raise typer.Exit(0)
+
+    console.print(create_issues_table(issues))
+    errors = [i for i in issues if i.severity == "error"]
+    fixable = [i for i in issues if i.fix]
+    console.print(
+        f"[dim]{len(errors)} error(s), {len(issues) - len(errors)} warning(s), "
+        f"{len(fixable)} automatically fixable[/dim]"
+    )
+
+    if not fix:
+        if fixable:
+            print_info("Run 'p4tenant doctor --fix' to apply the automatic repairs")
+        raise typer.Exit(1 if errors else 0)
+
+    if not fixable:
+        print_warning("Nothing can be repaired automatically")
+        raise typer.Exit(1 if errors else 0)
+
+    if not yes:
+        console.print()
+        if not Confirm.ask(f"[bold]Apply {len(fixable)} repair(s)?[/bold]", default=False):
+            print_warning("Aborted")
+            raise typer.Exit(0)
+
+    console.print()
+    console.print("[dim]Applying repairs...[/dim]")
+    changes = apply_fixes(index, fixable)
+    print_changes_panel(changes)
+    print_success(f"Applied {len(changes)} change(s)")
+    print_info("Run 'p4tenant doctor' again to check the result")
+
+
+@app.command()
+def metrics(
+    output_format: str = typer.Option("table", "--format", "-f", help="Output format: table, json or prom"),
+    output: Optional[Path] = typer.Option(None, "--output", "-o", help="Write to FILE instead of the terminal"),
+    last: int = typer.Option(20, "--last", "-n", help="Number of recent runs to show in table format"),
+) -> None:
+    """Show or export recorded command metrics.
+
+    Every add/remove/apply run appends a record (command, tenant, VM count,
+    phase durations, ansible exit code, bytes written) to the metrics file.
+
+    Use --format prom with --output pointing into node_exporter's textfile
+    collector directory to chart provisioning times. Setting
+    P4TENANT_METRICS_TEXTFILE refreshes that file automatically after each run.
+    """
+    records = load_records()
+
+    if output_format == "prom":
+        if output is not None:
+            write_textfile(output, records)
+            print_success(f"Wrote Prometheus metrics to {output}")
         else:
-            print_success("ansible-playbook completed successfully")
+            typer.echo(to_prometheus(records), nl=False)
+    elif output_format == "json":
+        text = json.dumps(records, indent=2)
+        if output is not None:
+            output.write_text(text + "\n")
+            print_success(f"Wrote {len(records)} record(s) to {output}")
+        else:
+            typer.echo(text)
+    elif output_format == "table":
+        console.print()
+        if not records:
+            print_info("No metrics recorded yet")
+            raise typer.Exit(0)
+        console.print(create_metrics_table(records[-last:]))
+        console.print(f"[dim]Total: {len(records)} run(s) recorded[/dim]")
+    else:
+        print_error(f"Unknown format '{output_format}' (expected table, json or prom)")
+        raise typer.Exit(1)
 
-    except FileNotFoundError:
-        print_error("ansible-playbook not found. Is Ansible installed?")
-    except Exception as e:
-        print_error(f"Error running ansible-playbook: {e}")
-    finally:
-        # Clean up temporary inventory
-        try:
-            temp_inventory.unlink()
-        except Exception:
-            pass
+
+@app.command()
+def inventory(
+    list_hosts: bool = typer.Option(False, "--list", help="Print the whole inventory with _meta.hostvars"),
+    host: Optional[str] = typer.Option(None, "--host", help="Print the variables of one host"),
+    admin: Optional[str] = typer.Option(
+        INVENTORY_ADMIN, "--admin", "-A", help="Use this admin's connection settings (env: P4TENANT_ADMIN)"
+    ),
+) -> None:
+    """Print the inventory as ansible dynamic inventory JSON.
+
+    Built from inventory.yaml, group_vars/, host_vars/ and admins.yaml in
+    one pass. Used by dynamic-inventory/p4tenant.sh:
+
+        P4TENANT_ADMIN=pgiaccone ansible-playbook -i dynamic-inventory/p4tenant.sh ...
+    """
+    if list_hosts == (host is not None):
+        typer.echo("Pass exactly one of --list or --host HOST", err=True)
+        raise typer.Exit(1)
+
+    data = build_dynamic_inventory(admin)
+    if host is not None:
+        data = data["_meta"]["hostvars"].get(host, {})
+    typer.echo(json.dumps(data, default=str))
 
 
 def run_ansible_remove_for_user(username: str, admin_user: str, vms_to_delete: list[str]) -> bool:
@@ -1053,42 +1900,60 @@ def run_ansible_remove_for_user(username: str, admin_user: str, vms_to_delete: l
     Returns:
         True if playbook succeeded, False otherwise
     """
-    import json
+    ok = run_playbook(
+        "removeuser.yaml",
+        admin_user,
+        vm_name=vms_to_delete[0] if vms_to_delete else f"restvm-{username}-01",
+        extra_vars={
+            "user_to_delete": username,
+            "confirm_deletion": "DELETE",
+            "vms_to_delete": vms_to_delete,
+        },
+    )
+    if ok:
+        forget_facts(vms_to_delete)
+    return ok
+
+
+def run_playbook(playbook_name: str, admin_user: str, vm_name: str, extra_vars: dict) -> bool:
+    """Run a playbook from playbooks/ with a minimal inventory.
+
+    Args:
+        playbook_name: File name under playbooks/
+        admin_user: Admin username for SSH connections
+        vm_name: VM to include in the minimal inventory
+        extra_vars: Variables passed with -e (lists are passed as JSON)
 
-    playbook = BASE_DIR / "playbooks" / "removeuser.yaml"
+    Returns:
+        True if playbook succeeded, False otherwise
+    """
+    playbook = BASE_DIR / "playbooks" / playbook_name
 
     if not playbook.exists():
         print_error(f"Playbook not found: {playbook}")
         return False
 
-    # Create minimal inventory for the removal operation
+    # Create minimal inventory for the operation
     console.print("[dim]Creating minimal inventory for ansible execution...[/dim]")
-    temp_inventory = create_minimal_inventory(
-        vm_name=vms_to_delete[0] if vms_to_delete else f"restvm-{username}-01",
-        admin_user=admin_user,
-    )
+    temp_inventory = create_minimal_inventory(vm_name=vm_name, admin_user=admin_user)
 
     try:
-        # Pass VMs as JSON list
-        vms_json = json.dumps(vms_to_delete)
-
         cmd = [
             "ansible-playbook",
             str(playbook),
             "-i",
             str(temp_inventory),
-            "-e",
-            f"user_to_delete={username}",
-            "-e",
-            "confirm_deletion=DELETE",
-            "-e",
-            f"vms_to_delete={vms_json}",
         ]
+        for key, value in extra_vars.items():
+            if isinstance(value, (list, dict)):
+                value = json.dumps(value)
+            cmd += ["-e", f"{key}={value}"]
 
         console.print(f"[dim]Running: {' '.join(cmd)}[/dim]")
         console.print()
 
-        result = subprocess.run(cmd, cwd=str(BASE_DIR))
+        result = subprocess.run(cmd, cwd=str(BASE_DIR), env=get_ansible_env(temp_inventory))
+        run_metrics.add_ansible_exit(result.returncode)
 
         if result.returncode != 0:
             print_error(f"ansible-playbook exited with code {result.returncode}")
@@ -1098,6 +1963,7 @@ def run_ansible_remove_for_user(username: str, admin_user: str, vms_to_delete: l
             return True
 
     except FileNotFoundError:
+        run_metrics.add_ansible_exit(127)
         print_error("ansible-playbook not found. Is Ansible installed?")
         return False
     except Exception as e:
@@ -35,14 +35,41 @@ def find_repo_root() -> Path:
 BASE_DIR = find_repo_root()
 
 # YAML file paths relative to BASE_DIR
-GROUP_VARS_ALL = BASE_DIR / "group_vars" / "all.yaml"
+GROUP_VARS_DIR = BASE_DIR / "group_vars"
+GROUP_VARS_ALL = GROUP_VARS_DIR / "all.yaml"
 HOST_VARS_DIR = BASE_DIR / "host_vars"
 HOST_VARS_RESTSRV01 = HOST_VARS_DIR / "restsrv01.yaml"
 INVENTORY_FILE = BASE_DIR / "inventory.yaml"
 
+# Default VM sizing (vm_vcpus, vm_ram_mb) used when host_vars don't override it
+KVM_PROVISION_DEFAULTS = BASE_DIR / "roles" / "kvm_provision" / "defaults" / "main.yaml"
+
+# Per-admin connection overrides for the generated inventory-{admin}.yaml files
+ADMIN_OVERRIDES_FILE = BASE_DIR / "admins.yaml"
+
+# Admin whose connection settings the dynamic inventory uses (p4tenant inventory)
+INVENTORY_ADMIN = os.environ.get("P4TENANT_ADMIN")
+
 # Backup directory
 BACKUP_DIR = BASE_DIR / ".p4tenant-backups"
 
+# Per-VM ansible-playbook logs of concurrent provisioning, see provision.py
+LOG_DIR = BASE_DIR / ".p4tenant-logs"
+
+# Ansible fact cache (jsonfile plugin) shared by p4tenant runs, see ansible_env.py,
+# and how long cached facts stay valid (seconds)
+FACT_CACHE_DIR = BASE_DIR / ".p4tenant-facts"
+FACT_CACHE_TIMEOUT = 86400
+
+# Maximum number of concurrent ansible-playbook processes
+DEFAULT_CONCURRENCY = int(os.environ.get("P4TENANT_CONCURRENCY", "4"))
+
+# Run metrics (one JSON record per line), see metrics.py
+METRICS_FILE = Path(os.environ.get("P4TENANT_METRICS_FILE", BASE_DIR / ".p4tenant-metrics.jsonl"))
+
+# Optional Prometheus textfile refreshed after every run (node_exporter textfile collector)
+METRICS_TEXTFILE = os.environ.get("P4TENANT_METRICS_TEXTFILE")
+
 # IP allocation settings
 IP_NETWORK = "10.10.0"
 IP_SUBNET_MASK = 24
@@ -54,13 +81,42 @@ RESERVED_IPS = {2, 3, 4, 5, 10, 101}
 VM_IP_START = 11
 VM_IP_END = 100
 
+# Dataplane MTU when group_vars/all.yaml sets no dataplane_mtu, and the
+# smallest MTU a VM may ask for (IPv6 minimum)
+DEFAULT_DATAPLANE_MTU = 1500
+MIN_DATAPLANE_MTU = 1280
+
 # VM naming
 VM_PREFIX = "restvm"
 VM_SUFFIX = "01"
 
+# Warm pool VMs are named like the VMs of this (reserved) user: restvm-pool-01, ...
+POOL_USERNAME = "pool"
+
 # Ansible settings
 DEFAULT_ANSIBLE_USER = "p4-restart"
-PROXY_COMMAND = '-o ProxyCommand="ssh ubuntu@restsrv01.polito.it -W %h:%p"'
+SERVER_HOST = "restsrv01.polito.it"
+
+# How long the shared SSH connection to the jump host outlives its last VM connection
+JUMP_CONTROL_PERSIST = "10m"
+
+# libvirt snapshot taken at the end of provisioning, reverted by `p4tenant reset`
+VM_SNAPSHOT_NAME = "p4tenant-provisioned"
+
+
+def get_proxy_command(proxy_user: str) -> str:
+    """Get the ansible_ssh_common_args reaching VMs through restsrv01 as proxy_user.
+
+    Equivalent to ProxyJump, but the jump connection is multiplexed over a
+    control socket per admin and jump host (ProxyJump can't pass SSH options
+    to the jump hop): connections to all VMs share one SSH session to
+    restsrv01, kept for JUMP_CONTROL_PERSIST after the last one.
+    """
+    control = (
+        f"-o ControlMaster=auto -o ControlPersist={JUMP_CONTROL_PERSIST} "
+        f"-o ControlPath=~/.ssh/p4tenant-jump-{proxy_user}@{SERVER_HOST}"
+    )
+    return f'-o ProxyCommand="ssh {control} {proxy_user}@{SERVER_HOST} -W %h:%p"'
 
 
 def get_vm_name(username: str, vm_number: int = 1) -> str:
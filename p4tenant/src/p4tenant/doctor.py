@@ -0,0 +1,316 @@
+"""Cross-file consistency checks and batch repairs for tenant configuration."""
+
+import ipaddress
+
+from ruamel.yaml.comments import CommentedMap
+
+from .capacity import find_cpu_conflicts
+from .config import (
+    DEFAULT_ANSIBLE_USER,
+    GROUP_VARS_ALL,
+    HOST_VARS_RESTSRV01,
+    INVENTORY_FILE,
+    IP_NETWORK,
+    IP_SUBNET_MASK,
+    RESERVED_IPS,
+    VM_IP_END,
+    VM_IP_START,
+    VM_PREFIX,
+    get_host_vars_path,
+)
+from .index import RepoIndex
+from .inventory import load_admin_overrides, render_admin_inventories, render_admin_inventory
+from .ip_allocator import find_free_pair, get_host_ips
+from .models import Issue
+from .profiling import span
+from .sriov_allocator import find_vf_conflicts
+
+VM_NETWORK = ipaddress.ip_network(f"{IP_NETWORK}.0/{IP_SUBNET_MASK}")
+
+
+def run_checks(index: RepoIndex) -> list[Issue]:
+    """Run all consistency checks against a loaded index.
+
+    Args:
+        index: Loaded repository index
+
+    Returns:
+        List of issues found, errors first
+    """
+    issues: list[Issue] = []
+    with span("check"):
+        issues += _check_vm_registration(index)
+        issues += _check_users(index)
+        issues += _check_addresses(index)
+        issues += _check_admin_inventories(index)
+        issues += _check_sriov(index)
+        issues += _check_cpu_pinning(index)
+
+    return sorted(issues, key=lambda i: (i.severity != "error", i.check, i.subject))
+
+
+def _check_vm_registration(index: RepoIndex) -> list[Issue]:
+    """Check that VMs agree across restsrv01 vms, inventory.yaml and host_vars."""
+    issues = []
+    server_vms = set(index.server_vms)
+    inventory_vms = set(index.inventory_vms)
+
+    for vm in index.server_vms:
+        if vm not in inventory_vms:
+            issues.append(Issue(
+                check="inventory-missing-vm",
+                severity="error",
+                subject=vm,
+                message=f"'{vm}' is in restsrv01 vms but not in inventory.yaml vms.hosts",
+                fix="Add to inventory.yaml vms.hosts",
+            ))
+        if vm not in index.host_vars:
+            issues.append(Issue(
+                check="vm-missing-host-vars",
+                severity="error",
+                subject=vm,
+                message=f"'{vm}' is in restsrv01 vms but host_vars/{vm}.yaml does not exist",
+            ))
+
+    for vm in index.inventory_vms:
+        if vm not in server_vms:
+            issue = Issue(
+                check="vm-not-defined",
+                severity="error",
+                subject=vm,
+                message=f"'{vm}' is in inventory.yaml but not in restsrv01 vms, so it is never provisioned",
+            )
+            if vm in index.host_vars:
+                issue.fix = "Add to restsrv01 vms"
+            issues.append(issue)
+
+    for host in index.host_vars:
+        if host in index.inventory_groups or host in server_vms or host == HOST_VARS_RESTSRV01.stem:
+            continue
+        issues.append(Issue(
+            check="orphan-host-vars",
+            severity="warning",
+            subject=host,
+            message=f"host_vars/{host}.yaml has no inventory entry and is not in restsrv01 vms",
+        ))
+
+    return issues
+
+
+def _check_users(index: RepoIndex) -> list[Issue]:
+    """Check restart_users against the users of defined VMs."""
+    issues = []
+    restart_users = set(index.restart_users)
+    server_vms = set(index.server_vms)
+
+    for user in index.restart_users:
+        if not any(vm in server_vms for vm in index.user_vms.get(user, [])):
+            issues.append(Issue(
+                check="user-without-vm",
+                severity="warning",
+                subject=user,
+                message=f"'{user}' is in restart_users but no defined VM lists it in host_users",
+            ))
+
+    for user, vms in sorted(index.user_vms.items()):
+        defined = [vm for vm in vms if vm in server_vms]
+        if defined and user not in restart_users:
+            issues.append(Issue(
+                check="unknown-vm-user",
+                severity="error",
+                subject=user,
+                message=f"'{user}' is in host_users of {', '.join(defined)} but not in restart_users",
+                fix="Add to restart_users",
+            ))
+
+    return issues
+
+
+def _is_tenant_vm(host: str) -> bool:
+    """Whether a host is a p4tenant-managed VM (and its addresses may be reallocated)."""
+    return host.startswith(f"{VM_PREFIX}-")
+
+
+def _check_addresses(index: RepoIndex) -> list[Issue]:
+    """Check for duplicate, out-of-range and conflicting dataplane addresses."""
+    issues = []
+
+    for ip, owners in sorted(index.ip_owners.items()):
+        if len(owners) > 1:
+            # Keep the address on non-tenant hosts first, then on the first tenant VM by name
+            keep = sorted(owners, key=lambda h: (_is_tenant_vm(h), h))[0]
+            movable = [h for h in owners if h != keep and _is_tenant_vm(h)]
+            issue = Issue(
+                check="duplicate-ip",
+                severity="error",
+                subject=ip,
+                message=f"{ip} is declared by {', '.join(sorted(owners))}",
+            )
+            if movable:
+                issue.fix = f"Reallocate {', '.join(movable)}"
+                issue.params = {"hosts": ",".join(movable)}
+            issues.append(issue)
+
+    for host, data in index.host_vars.items():
+        for ip in get_host_ips(data):
+            try:
+                iface = ipaddress.ip_interface(ip)
+            except ValueError:
+                issues.append(Issue(
+                    check="invalid-ip",
+                    severity="error",
+                    subject=host,
+                    message=f"'{ip}' in host_vars/{host}.yaml is not a valid address",
+                ))
+                continue
+
+            octet = int(iface.ip) & 0xFF
+            in_network = iface.ip in VM_NETWORK and iface.network.prefixlen == IP_SUBNET_MASK
+            in_vm_range = VM_IP_START <= octet <= VM_IP_END and octet not in RESERVED_IPS
+
+            if _is_tenant_vm(host):
+                if not (in_network and in_vm_range):
+                    issues.append(Issue(
+                        check="ip-out-of-range",
+                        severity="error",
+                        subject=host,
+                        message=(
+                            f"{ip} is outside {IP_NETWORK}.{VM_IP_START}-{VM_IP_END}/{IP_SUBNET_MASK} "
+                            "or reserved"
+                        ),
+                        fix=f"Reallocate {host}",
+                        params={"hosts": host},
+                    ))
+            elif in_network and in_vm_range:
+                # The allocator only scans restvm-* files, so it can hand this address out again
+                issues.append(Issue(
+                    check="address-conflict-risk",
+                    severity="warning",
+                    subject=host,
+                    message=(
+                        f"{ip} on non-{VM_PREFIX} host lies in the VM allocation range "
+                        "and is not in RESERVED_IPS"
+                    ),
+                ))
+
+    return issues
+
+
+def _check_admin_inventories(index: RepoIndex) -> list[Issue]:
+    """Check that admin inventories match their rendering from inventory.yaml."""
+    issues = []
+    main_vms = set(index.inventory_vms)
+    overrides = load_admin_overrides()
+
+    for admin, (path, data) in index.admin_inventories.items():
+        if path.read_text() == render_admin_inventory(index.inventory, admin, overrides):
+            continue
+
+        admin_vms = set(index.vms_hosts(data))
+        in_scope = main_vms - set(overrides.get(admin, {}).get("exclude_hosts") or [])
+        details = []
+        if missing := sorted(in_scope - admin_vms):
+            details.append(f"missing {', '.join(missing)}")
+        if extra := sorted(admin_vms - in_scope):
+            details.append(f"extra {', '.join(extra)}")
+        issues.append(Issue(
+            check="stale-admin-inventory",
+            severity="warning",
+            subject=path.name,
+            message=f"{path.name} differs from inventory.yaml" + (f" ({'; '.join(details)})" if details else ""),
+            fix="Regenerate from inventory.yaml",
+        ))
+
+    return issues
+
+
+def _check_sriov(index: RepoIndex) -> list[Issue]:
+    """Check that statically allocated SR-IOV VFs are unique and exist."""
+    return [
+        Issue(check="sriov-vf-conflict", severity="error", subject=problem.split()[0], message=problem)
+        for problem in find_vf_conflicts(index.srv_data)
+    ]
+
+
+def _check_cpu_pinning(index: RepoIndex) -> list[Issue]:
+    """Check that no host CPU is pinned to two VMs or reserved for the host."""
+    try:
+        problems = find_cpu_conflicts(index.srv_data)
+    except ValueError as e:
+        problems = [f"host_capacity: {e}"]
+    return [
+        Issue(check="cpu-pin-conflict", severity="error", subject=problem.split(" of ")[0], message=problem)
+        for problem in problems
+    ]
+
+
+def _vm_host_entry(vm_name: str) -> CommentedMap:
+    """Build an inventory host entry for a VM."""
+    entry = CommentedMap()
+    entry["ansible_host"] = vm_name
+    entry["ansible_user"] = DEFAULT_ANSIBLE_USER
+    return entry
+
+
+def apply_fixes(index: RepoIndex, issues: list[Issue]) -> list[tuple[str, str]]:
+    """Apply all automatic repairs to the index and write them in one transaction.
+
+    Args:
+        index: Index the issues were found in
+        issues: Issues from run_checks()
+
+    Returns:
+        List of (file_path, description) for changes made
+    """
+    changes: list[tuple[str, str]] = []
+    used = index.used_octets() | RESERVED_IPS
+    reallocated: set[str] = set()
+
+    with span("fix"):
+        for issue in issues:
+            if not issue.fix:
+                continue
+
+            if issue.check == "inventory-missing-vm":
+                inv = index.inventory
+                inv.setdefault("vms", CommentedMap()).setdefault("hosts", CommentedMap())
+                inv["vms"]["hosts"][issue.subject] = _vm_host_entry(issue.subject)
+                index.mark_dirty(INVENTORY_FILE, inv)
+                changes.append(("inventory.yaml", f"Add '{issue.subject}' to vms.hosts"))
+
+            elif issue.check == "vm-not-defined":
+                index.srv_data.setdefault("vms", []).append(issue.subject)
+                index.mark_dirty(HOST_VARS_RESTSRV01, index.srv_data)
+                changes.append(("host_vars/restsrv01.yaml", f"Add '{issue.subject}' to vms list"))
+
+            elif issue.check == "unknown-vm-user":
+                index.all_data.setdefault("restart_users", []).append(issue.subject)
+                index.mark_dirty(GROUP_VARS_ALL, index.all_data)
+                changes.append(("group_vars/all.yaml", f"Add '{issue.subject}' to restart_users"))
+
+            elif issue.check in ("duplicate-ip", "ip-out-of-range"):
+                # A VM with several bad addresses is reallocated only once
+                for host in issue.params["hosts"].split(","):
+                    if host in reallocated:
+                        continue
+                    ip_alloc = find_free_pair(used)
+                    if ip_alloc is None:
+                        changes.append((f"host_vars/{host}.yaml", "[SKIP] No free IP pair to reallocate"))
+                        continue
+                    used |= {int(ip_alloc.ip1_bare.split(".")[-1]), int(ip_alloc.ip2_bare.split(".")[-1])}
+                    data = index.host_vars[host]
+                    data["dataplane_ipv4"] = [ip_alloc.ip1, ip_alloc.ip2]
+                    index.mark_dirty(get_host_vars_path(host), data)
+                    reallocated.add(host)
+                    changes.append(
+                        (f"host_vars/{host}.yaml", f"Reallocate dataplane_ipv4 ({ip_alloc.ip1}, {ip_alloc.ip2})")
+                    )
+
+        # Admin inventories are derived from the (possibly repaired) inventory.yaml
+        for path, text in render_admin_inventories(index.inventory).items():
+            index.mark_dirty(path, text)
+            changes.append((path.name, "Regenerate from inventory.yaml"))
+
+        index.commit()
+
+    return changes
@@ -0,0 +1,124 @@
+"""Single-pass, in-memory index of all tenant configuration files."""
+
+from pathlib import Path
+from typing import Any
+
+from ruamel.yaml.comments import CommentedMap
+
+from .config import (
+    BASE_DIR,
+    GROUP_VARS_ALL,
+    HOST_VARS_DIR,
+    HOST_VARS_RESTSRV01,
+    INVENTORY_FILE,
+)
+from .ip_allocator import get_host_ips
+from .profiling import span
+from .yaml_editor import YamlTransaction, load_yaml
+
+
+class RepoIndex:
+    """All tenant configuration loaded once, with lookup tables built on top.
+
+    Every file is parsed exactly once. Checks and repairs work on the loaded
+    documents and lookup dictionaries instead of re-reading files, and
+    modified documents are written back together by commit().
+    """
+
+    def __init__(self) -> None:
+        with span("load"):
+            self.all_data = load_yaml(GROUP_VARS_ALL) or CommentedMap()
+            self.srv_data = load_yaml(HOST_VARS_RESTSRV01) or CommentedMap()
+            self.inventory = load_yaml(INVENTORY_FILE) or CommentedMap()
+
+            # Admin inventories keyed by admin username
+            self.admin_inventories: dict[str, tuple[Path, Any]] = {}
+            for inv_file in sorted(BASE_DIR.glob("inventory-*.yaml")):
+                admin = inv_file.stem.replace("inventory-", "")
+                try:
+                    self.admin_inventories[admin] = (inv_file, load_yaml(inv_file) or CommentedMap())
+                except Exception:
+                    continue
+
+            # host_vars documents keyed by host name
+            self.host_vars: dict[str, Any] = {}
+            for hv_file in sorted(HOST_VARS_DIR.glob("*.yaml")):
+                try:
+                    self.host_vars[hv_file.stem] = load_yaml(hv_file) or CommentedMap()
+                except Exception:
+                    continue
+
+        with span("index"):
+            self._build_indexes()
+
+        self._dirty: dict[Path, Any] = {}
+        self._deleted: set[Path] = set()
+
+    def _build_indexes(self) -> None:
+        """Build lookup tables from the loaded documents."""
+        self.restart_users: list[str] = list(self.all_data.get("restart_users") or [])
+        self.server_vms: list[str] = list(self.srv_data.get("vms") or [])
+
+        # Every inventory host mapped to the groups it belongs to
+        self.inventory_groups: dict[str, list[str]] = {}
+        for group, group_data in self.inventory.items():
+            hosts = (group_data or {}).get("hosts") or {}
+            for host in hosts:
+                self.inventory_groups.setdefault(host, []).append(group)
+
+        self.inventory_vms: list[str] = list(self.vms_hosts(self.inventory))
+
+        # Dataplane address (without mask) -> hosts declaring it
+        self.ip_owners: dict[str, list[str]] = {}
+        # Username -> VMs listing the user in host_users
+        self.user_vms: dict[str, list[str]] = {}
+        for host, data in self.host_vars.items():
+            for ip in get_host_ips(data):
+                self.ip_owners.setdefault(ip.split("/")[0], []).append(host)
+            for user in data.get("host_users") or []:
+                self.user_vms.setdefault(str(user), []).append(host)
+
+    @staticmethod
+    def vms_hosts(inventory: Any) -> Any:
+        """Get the vms.hosts mapping of an inventory document (may be empty)."""
+        return ((inventory or {}).get("vms") or {}).get("hosts") or {}
+
+    def used_octets(self) -> set[int]:
+        """Get last octets of all addresses declared in any host_vars file."""
+        used = set()
+        for ip in self.ip_owners:
+            try:
+                used.add(int(ip.split(".")[-1]))
+            except ValueError:
+                continue
+        return used
+
+    def mark_dirty(self, path: Path, data: Any) -> None:
+        """Record that a loaded document was modified and must be written."""
+        self._deleted.discard(path)
+        self._dirty[path] = data
+
+    def mark_deleted(self, path: Path) -> None:
+        """Record that a file must be deleted."""
+        self._dirty.pop(path, None)
+        self._deleted.add(path)
+
+    def commit(self) -> list[Path]:
+        """Write all modified documents in one transaction.
+
+        Returns:
+            List of paths that were written or deleted
+        """
+        transaction = YamlTransaction()
+        for path, data in self._dirty.items():
+            transaction.save(path, data)
+        for path in self._deleted:
+            transaction.delete(path)
+
+        if not transaction:
+            return []
+
+        written = transaction.commit()
+        self._dirty.clear()
+        self._deleted.clear()
+        return written
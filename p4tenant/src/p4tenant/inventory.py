@@ -1,24 +1,39 @@
 """Inventory management for faster ansible execution and admin user support."""
 
-import os
+import copy
 import uuid
 from pathlib import Path
+from typing import Any
 
 from ruamel.yaml.comments import CommentedMap
 
-from .config import BASE_DIR, DEFAULT_ANSIBLE_USER, INVENTORY_FILE
-from .yaml_editor import get_yaml, load_yaml, save_yaml
+from .config import (
+    ADMIN_OVERRIDES_FILE,
+    BASE_DIR,
+    DEFAULT_ANSIBLE_USER,
+    GROUP_VARS_DIR,
+    HOST_VARS_DIR,
+    INVENTORY_FILE,
+    get_proxy_command,
+)
+from .yaml_editor import dump_yaml_str, get_yaml, load_yaml
 
 # Temp inventory prefix - in project root so Ansible finds group_vars/
 TEMP_INVENTORY_PREFIX = ".p4tenant-inventory-"
 
+# First lines of every generated admin inventory
+GENERATED_HEADER = (
+    "# Generated by p4tenant from inventory.yaml and admins.yaml - do not edit.\n"
+    "# Regenerated automatically on add/remove; run 'p4tenant doctor --fix' after manual edits.\n"
+)
+
 
 # Known admin users (auto-discovered from inventory-*.yaml files)
 def get_admin_users() -> list[str]:
-    """Discover admin users from existing inventory files.
+    """Discover admin users from existing inventory files and admins.yaml.
 
     Returns:
-        List of admin usernames found in inventory-{user}.yaml files
+        List of admin usernames found in inventory-{user}.yaml files or admins.yaml
     """
     admins = []
     for inv_file in BASE_DIR.glob("inventory-*.yaml"):
@@ -27,10 +42,15 @@ def get_admin_users() -> list[str]:
         if name:
             admins.append(name)
 
+    # Admins using the dynamic inventory may have no inventory file
+    try:
+        admins.extend(load_admin_overrides())
+    except Exception:
+        pass
+
     # Also check main inventory for the default admin
     try:
-        main_inv = load_yaml(INVENTORY_FILE)
-        default_admin = main_inv.get("servers", {}).get("hosts", {}).get("restsrv01", {}).get("ansible_user")
+        default_admin = get_default_admin(load_yaml(INVENTORY_FILE))
         if default_admin and default_admin not in admins:
             admins.insert(0, default_admin)
     except Exception:
@@ -39,6 +59,11 @@ def get_admin_users() -> list[str]:
     return sorted(set(admins))
 
 
+def get_default_admin(main_inv: Any) -> str | None:
+    """Get the admin user configured for restsrv01 in inventory.yaml."""
+    return ((main_inv.get("servers") or {}).get("hosts") or {}).get("restsrv01", {}).get("ansible_user")
+
+
 def get_admin_inventory_path(admin_user: str) -> Path:
     """Get the inventory file path for an admin user.
 
@@ -98,9 +123,7 @@ def create_minimal_inventory(
     inventory["vms"]["hosts"][vm_name]["ansible_host"] = vm_name
     inventory["vms"]["hosts"][vm_name]["ansible_user"] = DEFAULT_ANSIBLE_USER
     inventory["vms"]["vars"] = CommentedMap()
-    inventory["vms"]["vars"]["ansible_ssh_common_args"] = (
-        f'-o ProxyCommand="ssh {admin_user}@restsrv01.polito.it -W %h:%p"'
-    )
+    inventory["vms"]["vars"]["ansible_ssh_common_args"] = get_proxy_command(admin_user)
 
     # Determine output path
     if output_path is None:
@@ -116,82 +139,178 @@ def create_minimal_inventory(
     return output_path
 
 
-def sync_admin_inventory(admin_user: str, vm_name: str) -> Path | None:
-    """Sync an admin-specific inventory with a new VM.
+def load_admin_overrides() -> dict[str, dict]:
+    """Load per-admin connection overrides from admins.yaml.
 
-    Creates or updates inventory-{admin_user}.yaml with the new VM.
+    Returns:
+        Mapping of admin username to its overrides (may be empty)
+    """
+    if not ADMIN_OVERRIDES_FILE.exists():
+        return {}
+    data = load_yaml(ADMIN_OVERRIDES_FILE) or {}
+    return {str(admin): dict(values or {}) for admin, values in data.items()}
+
+
+def render_admin_inventory(main_inv: Any, admin_user: str, overrides: dict[str, dict]) -> str:
+    """Render an admin inventory from the main inventory.
+
+    The admin copy is inventory.yaml with two connection settings replaced:
+    the SSH user for restsrv01 and the user of the ProxyCommand to the VMs.
+    Both default to the admin username and can be overridden in admins.yaml
+    with `ansible_user` and `proxy_user`. admins.yaml can also narrow the
+    admin's host scope with `exclude_hosts` and `exclude_groups`.
 
     Args:
+        main_inv: Loaded inventory.yaml data
         admin_user: Admin username
-        vm_name: Name of the VM to add
+        overrides: Overrides from load_admin_overrides()
 
     Returns:
-        Path to the admin inventory file, or None if main inventory
+        Full file content for inventory-{admin_user}.yaml
     """
-    inv_path = get_admin_inventory_path(admin_user)
+    inv_data = copy.deepcopy(main_inv)
+    apply_admin_overrides(inv_data, admin_user, overrides)
+    return GENERATED_HEADER + dump_yaml_str(inv_data)
 
-    # Check main inventory to see who the default admin is
-    main_inv = load_yaml(INVENTORY_FILE)
-    default_admin = main_inv.get("servers", {}).get("hosts", {}).get("restsrv01", {}).get("ansible_user")
 
-    # If this is the default admin, we already updated inventory.yaml
-    if admin_user == default_admin:
-        return None
+def _trailing_comment_slot(node: Any) -> tuple[Any, Any]:
+    """Find the mapping and key whose comment slot holds the lines after a node.
 
-    if inv_path.exists():
-        # Update existing admin inventory
-        inv_data = load_yaml(inv_path)
-    else:
-        # Create new admin inventory based on main inventory
-        inv_data = load_yaml(INVENTORY_FILE)
+    ruamel attaches the comments between two groups (e.g. the next group's
+    description) to the last scalar of the first one.
+    """
+    while isinstance(node, CommentedMap) and node:
+        key = list(node)[-1]
+        if not isinstance(node[key], CommentedMap) or not node[key]:
+            return node, key
+        node = node[key]
+    return None, None
+
+
+def _drop_group(inv_data: Any, group: str) -> None:
+    """Remove a group from an inventory, keeping the comments of the groups around it."""
+    groups = list(inv_data)
+    if group not in groups:
+        return
+    index = groups.index(group)
+    if index > 0:
+        prev_map, prev_key = _trailing_comment_slot(inv_data[groups[index - 1]])
+        drop_map, drop_key = _trailing_comment_slot(inv_data[group])
+        if prev_map is not None:
+            comment = drop_map.ca.items.get(drop_key, [None] * 4)[2] if drop_map is not None else None
+            prev_map.ca.items.setdefault(prev_key, [None] * 4)[2] = comment
+    del inv_data[group]
+
+
+def apply_admin_overrides(inv_data: Any, admin_user: str, overrides: dict[str, dict]) -> None:
+    """Set an admin's connection settings and host scope in an inventory, in place.
+
+    Hosts in the admin's `exclude_hosts` are dropped from every group and
+    groups in `exclude_groups` are dropped entirely, so the admin's
+    playbooks never target them.
 
-        # Update admin user in servers section
-        if "servers" in inv_data and "hosts" in inv_data["servers"]:
-            if "restsrv01" in inv_data["servers"]["hosts"]:
-                inv_data["servers"]["hosts"]["restsrv01"]["ansible_user"] = admin_user
+    Args:
+        inv_data: Inventory data (modified)
+        admin_user: Admin username
+        overrides: Overrides from load_admin_overrides()
+    """
+    override = overrides.get(admin_user, {})
 
-        # Update ProxyCommand in vms vars
-        if "vms" in inv_data and "vars" in inv_data["vms"]:
-            inv_data["vms"]["vars"]["ansible_ssh_common_args"] = (
-                f'-o ProxyCommand="ssh {admin_user}@restsrv01.polito.it -W %h:%p"'
-            )
+    for group in override.get("exclude_groups") or []:
+        _drop_group(inv_data, group)
+    excluded = {str(host) for host in override.get("exclude_hosts") or []}
+    for group_data in inv_data.values():
+        hosts = (group_data or {}).get("hosts") or {}
+        for host in [host for host in hosts if host in excluded]:
+            del hosts[host]
 
-    # Add the new VM if not already present
-    if "vms" not in inv_data:
-        inv_data["vms"] = CommentedMap()
-    if "hosts" not in inv_data["vms"]:
-        inv_data["vms"]["hosts"] = CommentedMap()
+    servers = inv_data.get("servers") or {}
+    if "restsrv01" in (servers.get("hosts") or {}):
+        servers["hosts"]["restsrv01"]["ansible_user"] = override.get("ansible_user", admin_user)
 
-    if vm_name not in inv_data["vms"]["hosts"]:
-        vm_entry = CommentedMap()
-        vm_entry["ansible_host"] = vm_name
-        vm_entry["ansible_user"] = DEFAULT_ANSIBLE_USER
-        inv_data["vms"]["hosts"][vm_name] = vm_entry
+    if "vms" in inv_data:
+        if inv_data["vms"].get("vars") is None:
+            inv_data["vms"]["vars"] = CommentedMap()
+        inv_data["vms"]["vars"]["ansible_ssh_common_args"] = get_proxy_command(
+            override.get("proxy_user", admin_user)
+        )
 
-    save_yaml(inv_path, inv_data, backup=True)
-    return inv_path
 
+def render_admin_inventories(main_inv: Any) -> dict[Path, str]:
+    """Render the admin inventories whose content differs from inventory.yaml.
 
-def remove_from_admin_inventories(vm_name: str) -> list[Path]:
-    """Remove a VM from all admin-specific inventories.
+    Every existing inventory-*.yaml is rendered from main_inv; admins.yaml
+    is loaded once for all of them. No copy is created for new admins: the
+    dynamic inventory (build_dynamic_inventory) serves every admin.
 
     Args:
-        vm_name: Name of the VM to remove
+        main_inv: Loaded (possibly modified in memory) inventory.yaml data
 
     Returns:
-        List of paths to inventories that were modified
+        Mapping of admin inventory path to its new content, for changed files only
     """
-    modified = []
+    overrides = load_admin_overrides()
+    admins = {inv_file.stem.replace("inventory-", "") for inv_file in BASE_DIR.glob("inventory-*.yaml")}
 
-    for inv_file in BASE_DIR.glob("inventory-*.yaml"):
-        try:
-            inv_data = load_yaml(inv_file)
-            if "vms" in inv_data and "hosts" in inv_data["vms"]:
-                if vm_name in inv_data["vms"]["hosts"]:
-                    del inv_data["vms"]["hosts"][vm_name]
-                    save_yaml(inv_file, inv_data, backup=True)
-                    modified.append(inv_file)
-        except Exception:
-            continue
-
-    return modified
+    changed = {}
+    for admin in sorted(admins):
+        inv_path = get_admin_inventory_path(admin)
+        text = render_admin_inventory(main_inv, admin, overrides)
+        if not inv_path.exists() or inv_path.read_text() != text:
+            changed[inv_path] = text
+
+    return changed
+
+
+
+def _merge_vars(*layers: Any) -> dict:
+    """Merge variable mappings, later layers winning (like ansible's precedence)."""
+    merged: dict = {}
+    for layer in layers:
+        merged.update(layer or {})
+    return merged
+
+
+def build_dynamic_inventory(admin_user: str | None = None) -> dict:
+    """Build the whole inventory in ansible's dynamic inventory JSON format.
+
+    inventory.yaml, group_vars/ and host_vars/ are loaded once and returned
+    as one document for `--list`: groups with their hosts and vars, and
+    every host's variables under _meta.hostvars, so ansible neither calls
+    the script per host nor loads the YAML files itself. Vars files win
+    over variables set in inventory.yaml, as in ansible.
+
+    Args:
+        admin_user: Admin whose connection settings (admins.yaml) replace
+            those of inventory.yaml, like in inventory-{admin_user}.yaml
+
+    Returns:
+        Inventory dictionary, ready for json.dumps
+    """
+    inv_data = load_yaml(INVENTORY_FILE) or CommentedMap()
+    if admin_user:
+        apply_admin_overrides(inv_data, admin_user, load_admin_overrides())
+
+    group_vars = {path.stem: load_yaml(path) for path in sorted(GROUP_VARS_DIR.glob("*.yaml"))}
+
+    inventory: dict[str, Any] = {"all": {"vars": _merge_vars(group_vars.get("all")), "children": []}}
+    host_vars: dict[str, dict] = {}
+    for group, group_data in inv_data.items():
+        group_data = group_data or {}
+        hosts = group_data.get("hosts") or {}
+        inventory["all"]["children"].append(str(group))
+        inventory[str(group)] = {
+            "hosts": [str(host) for host in hosts],
+            "vars": _merge_vars(group_data.get("vars"), group_vars.get(group)),
+            "children": [str(child) for child in group_data.get("children") or {}],
+        }
+        for host, values in hosts.items():
+            host_vars.setdefault(str(host), {}).update(values or {})
+
+    for host, values in host_vars.items():
+        path = HOST_VARS_DIR / f"{host}.yaml"
+        if path.exists():
+            values.update(load_yaml(path) or {})
+
+    inventory["_meta"] = {"hostvars": host_vars}
+    return inventory
@@ -2,6 +2,7 @@
 
 import re
 from pathlib import Path
+from typing import Any
 
 from .config import (
     HOST_VARS_DIR,
@@ -12,6 +13,7 @@ from .config import (
     VM_IP_START,
 )
 from .models import IPAllocation
+from .profiling import span
 from .yaml_editor import load_yaml
 
 
@@ -23,19 +25,20 @@ def scan_used_ips() -> set[int]:
     """
     used_ips: set[int] = set()
 
-    # Pattern to match restvm-*.yaml files
-    for yaml_file in HOST_VARS_DIR.glob("restvm-*.yaml"):
-        try:
-            data = load_yaml(yaml_file)
-            if data and "dataplane_ipv4" in data:
-                for ip_entry in data["dataplane_ipv4"]:
-                    # Extract last octet from IP like "10.10.0.13/24"
-                    match = re.search(r"\.(\d+)/", str(ip_entry))
-                    if match:
-                        used_ips.add(int(match.group(1)))
-        except Exception:
-            # Skip files that can't be parsed
-            continue
+    with span("ip scan"):
+        # Pattern to match restvm-*.yaml files
+        for yaml_file in HOST_VARS_DIR.glob("restvm-*.yaml"):
+            try:
+                data = load_yaml(yaml_file)
+                if data and "dataplane_ipv4" in data:
+                    for ip_entry in data["dataplane_ipv4"]:
+                        # Extract last octet from IP like "10.10.0.13/24"
+                        match = re.search(r"\.(\d+)/", str(ip_entry))
+                        if match:
+                            used_ips.add(int(match.group(1)))
+            except Exception:
+                # Skip files that can't be parsed
+                continue
 
     return used_ips
 
@@ -49,14 +52,68 @@ def get_all_used_ips() -> set[int]:
     return RESERVED_IPS | scan_used_ips()
 
 
+def get_host_ips(data: Any) -> list[str]:
+    """Get the dataplane addresses declared in a host_vars document.
+
+    Handles both the VM form (a list of "10.10.0.13/24" strings) and the
+    switch form (a list of {ifname, ip} mappings).
+
+    Args:
+        data: Loaded host_vars data
+
+    Returns:
+        List of addresses with subnet mask, e.g. ["10.10.0.13/24"]
+    """
+    if not data or "dataplane_ipv4" not in data:
+        return []
+
+    ips = []
+    for entry in data["dataplane_ipv4"] or []:
+        if isinstance(entry, dict):
+            entry = entry.get("ip")
+        if entry:
+            ips.append(str(entry))
+    return ips
+
+
 def allocate_ip_pair() -> IPAllocation | None:
     """Allocate a consecutive pair of IPs for a new tenant.
 
     Returns:
         IPAllocation with two consecutive IPs, or None if no space available
     """
+    return find_free_pair(get_all_used_ips())
+
+
+def allocate_ip_pairs(count: int) -> list[IPAllocation] | None:
+    """Allocate several distinct consecutive pairs from a single scan.
+
+    Args:
+        count: Number of pairs (one per VM)
+
+    Returns:
+        List of IPAllocation, or None if there is not enough space
+    """
     used = get_all_used_ips()
+    allocations = []
+    for _ in range(count):
+        ip_alloc = find_free_pair(used)
+        if ip_alloc is None:
+            return None
+        used |= {int(ip_alloc.ip1_bare.split(".")[-1]), int(ip_alloc.ip2_bare.split(".")[-1])}
+        allocations.append(ip_alloc)
+    return allocations
 
+
+def find_free_pair(used: set[int]) -> IPAllocation | None:
+    """Find the first consecutive pair of IPs not in used.
+
+    Args:
+        used: Unavailable IP last octets (used and reserved)
+
+    Returns:
+        IPAllocation with two consecutive IPs, or None if no space available
+    """
     # Find first available consecutive pair
     for start in range(VM_IP_START, VM_IP_END, 2):
         if start not in used and (start + 1) not in used:
@@ -0,0 +1,212 @@
+"""Run metrics for p4tenant commands, with Prometheus text export."""
+
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any
+
+from .config import METRICS_FILE, METRICS_TEXTFILE
+
+# Commands whose runs are recorded in the metrics file
+TRACKED_COMMANDS = {"add user", "add vm", "remove", "apply", "apply-plan", "pool fill", "reset"}
+
+
+class RunMetrics:
+    """Collects metrics for the current command run."""
+
+    def __init__(self) -> None:
+        self.tenant: str | None = None
+        self.vm_count = 0
+        self.ansible_exit_code: int | None = None
+        self.bytes_written = 0
+        self.files_written = 0
+
+    def set_tenant(self, tenant: str, vm_count: int) -> None:
+        """Record the tenant and number of VMs the command operates on."""
+        self.tenant = tenant
+        self.vm_count = vm_count
+
+    def add_write(self, num_bytes: int) -> None:
+        """Account for a configuration file written by the command."""
+        self.bytes_written += num_bytes
+        self.files_written += 1
+
+    def add_ansible_exit(self, exit_code: int) -> None:
+        """Record an ansible-playbook exit code, keeping the first failure."""
+        if self.ansible_exit_code is None or self.ansible_exit_code == 0:
+            self.ansible_exit_code = exit_code
+
+
+# Process-wide collector for the running command
+run_metrics = RunMetrics()
+
+
+def build_record(
+    command: str,
+    duration: float,
+    phases: dict[str, float],
+    exit_code: int,
+) -> dict[str, Any]:
+    """Build the metrics record for a finished run.
+
+    Args:
+        command: Command path, e.g. "add user"
+        duration: Total wall-clock seconds
+        phases: Seconds spent in each top-level phase
+        exit_code: Exit code of the command
+
+    Returns:
+        Dictionary ready to be serialised as one JSON line
+    """
+    return {
+        "timestamp": round(time.time(), 3),
+        "command": command,
+        "tenant": run_metrics.tenant,
+        "vm_count": run_metrics.vm_count,
+        "exit_code": exit_code,
+        "duration_s": round(duration, 4),
+        "phases_s": {name: round(seconds, 4) for name, seconds in phases.items()},
+        "ansible_exit_code": run_metrics.ansible_exit_code,
+        "bytes_written": run_metrics.bytes_written,
+        "files_written": run_metrics.files_written,
+    }
+
+
+def append_record(record: dict[str, Any], path: Path = METRICS_FILE) -> None:
+    """Append a run record to the metrics file.
+
+    Also refreshes the Prometheus textfile if P4TENANT_METRICS_TEXTFILE is set.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a") as f:
+        f.write(json.dumps(record, sort_keys=True) + "\n")
+
+    if METRICS_TEXTFILE:
+        write_textfile(Path(METRICS_TEXTFILE), load_records(path))
+
+
+def load_records(path: Path = METRICS_FILE) -> list[dict[str, Any]]:
+    """Load all run records from the metrics file.
+
+    Returns:
+        List of records in file order; unparsable lines are skipped
+    """
+    if not path.exists():
+        return []
+
+    records = []
+    with open(path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return records
+
+
+def _labels(**labels: Any) -> str:
+    """Format Prometheus labels, escaping values."""
+    parts = []
+    for key, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{key}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def to_prometheus(records: list[dict[str, Any]]) -> str:
+    """Render run records in Prometheus text-exposition format.
+
+    Counters and sums cover all recorded runs; gauges describe the most
+    recent run of each command.
+
+    Args:
+        records: Run records from load_records()
+
+    Returns:
+        Exposition text, suitable for node_exporter's textfile collector
+    """
+    runs: dict[str, int] = {}
+    failures: dict[str, int] = {}
+    duration_sum: dict[str, float] = {}
+    bytes_total: dict[str, int] = {}
+    last: dict[str, dict[str, Any]] = {}
+
+    for record in records:
+        command = record.get("command", "unknown")
+        runs[command] = runs.get(command, 0) + 1
+        if record.get("exit_code") or record.get("ansible_exit_code"):
+            failures[command] = failures.get(command, 0) + 1
+        duration_sum[command] = duration_sum.get(command, 0.0) + record.get("duration_s", 0.0)
+        bytes_total[command] = bytes_total.get(command, 0) + record.get("bytes_written", 0)
+        last[command] = record
+
+    lines: list[str] = []
+
+    def metric(name: str, kind: str, help_text: str, samples: list[tuple[str, Any]]) -> None:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            lines.append(f"{name}{labels} {value}")
+
+    commands = sorted(runs)
+
+    metric(
+        "p4tenant_runs_total", "counter", "Recorded p4tenant command runs.",
+        [(_labels(command=c), runs[c]) for c in commands],
+    )
+    metric(
+        "p4tenant_failures_total", "counter", "Runs that exited non-zero or had a failing ansible run.",
+        [(_labels(command=c), failures.get(c, 0)) for c in commands],
+    )
+    metric(
+        "p4tenant_duration_seconds_total", "counter", "Total wall-clock seconds spent in each command.",
+        [(_labels(command=c), round(duration_sum[c], 4)) for c in commands],
+    )
+    metric(
+        "p4tenant_bytes_written_total", "counter", "Configuration bytes written by each command.",
+        [(_labels(command=c), bytes_total[c]) for c in commands],
+    )
+    metric(
+        "p4tenant_last_run_timestamp_seconds", "gauge", "Unix time of the last run of each command.",
+        [(_labels(command=c), last[c].get("timestamp", 0)) for c in commands],
+    )
+    metric(
+        "p4tenant_last_run_duration_seconds", "gauge", "Wall-clock seconds of the last run of each command.",
+        [(_labels(command=c), last[c].get("duration_s", 0)) for c in commands],
+    )
+    metric(
+        "p4tenant_last_run_vms", "gauge", "Number of VMs handled by the last run of each command.",
+        [(_labels(command=c), last[c].get("vm_count", 0)) for c in commands],
+    )
+    metric(
+        "p4tenant_last_run_phase_seconds", "gauge", "Seconds spent in each phase of the last run.",
+        [
+            (_labels(command=c, phase=phase), seconds)
+            for c in commands
+            for phase, seconds in sorted(last[c].get("phases_s", {}).items())
+        ],
+    )
+    metric(
+        "p4tenant_last_run_ansible_exit_code", "gauge", "ansible-playbook exit code of the last run (-1 if not run).",
+        [
+            (_labels(command=c), -1 if last[c].get("ansible_exit_code") is None else last[c]["ansible_exit_code"])
+            for c in commands
+        ],
+    )
+
+    return "\n".join(lines) + "\n"
+
+
+def write_textfile(path: Path, records: list[dict[str, Any]]) -> None:
+    """Write the Prometheus exposition atomically.
+
+    node_exporter may read the file at any time, so write next to it and rename.
+    """
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "w") as f:
+        f.write(to_prometheus(records))
+    os.replace(tmp_path, path)
@@ -1,7 +1,7 @@
 """Pydantic models for input validation."""
 
 import re
-from typing import Optional
+from typing import Literal, Optional
 
 from pydantic import BaseModel, field_validator
 
@@ -62,6 +62,46 @@ class IPAllocation(BaseModel):
         return self.ip2.split("/")[0]
 
 
+class VFAllocation(BaseModel):
+    """Represents SR-IOV VFs of one PF allocated to a VM."""
+
+    pf: str  # e.g., "ens5f1"
+    vfs: list[int]  # e.g., [10, 11]
+
+    @property
+    def label(self) -> str:
+        """Get a short description, e.g. "ens5f1 VF 10-11"."""
+        if len(self.vfs) == 1:
+            return f"{self.pf} VF {self.vfs[0]}"
+        return f"{self.pf} VF {self.vfs[0]}-{self.vfs[-1]}"
+
+
+class HostCapacity(BaseModel):
+    """Hypervisor resources VMs may be given (host_capacity in host_vars/restsrv01.yaml)."""
+
+    vcpus: int  # physical CPU threads
+    ram_mb: int  # MiB usable by VMs
+    vcpu_overcommit: float = 1.0  # allowed ratio of committed to physical vCPUs
+    ram_overcommit: float = 1.0
+    on_overcommit: Literal["refuse", "warn"] = "refuse"
+    numa_nodes: dict[int, str] = {}  # NUMA node -> host CPU list, e.g. {0: "0-15,32-47"}
+    reserved_cpus: str = ""  # host CPUs never pinned to VMs, e.g. "0-1"
+
+
+class VMResources(BaseModel):
+    """vCPUs and RAM of one VM."""
+
+    vcpus: int
+    ram_mb: int
+
+
+class CPUPinning(BaseModel):
+    """Dedicated host CPUs of a VM, one per vCPU, on a single NUMA node."""
+
+    numa_node: int
+    cpus: list[int]
+
+
 class TenantInfo(BaseModel):
     """Information about an existing tenant."""
 
@@ -72,3 +112,14 @@ class TenantInfo(BaseModel):
     in_vms_list: bool
     in_inventory: bool
     has_host_vars: bool
+
+
+class Issue(BaseModel):
+    """A consistency problem found by `p4tenant doctor`."""
+
+    check: str  # e.g., "inventory-missing-vm"
+    severity: str  # "error" or "warning"
+    subject: str  # host, user or file the issue is about
+    message: str
+    fix: Optional[str] = None  # description of the automatic repair, if any
+    params: dict[str, str] = {}  # extra data needed by the repair
@@ -0,0 +1,204 @@
+"""Serialisable change plans: compute once, review, then apply from memory."""
+
+import hashlib
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Optional
+
+from pydantic import BaseModel
+
+from .config import BASE_DIR
+from .models import IPAllocation, VFAllocation
+from .profiling import span
+from .yaml_editor import YamlTransaction, dump_yaml_str, load_yaml
+
+PLAN_VERSION = 1
+
+# Hash recorded for inputs that did not exist when the plan was made
+ABSENT = "absent"
+
+
+class StalePlanError(Exception):
+    """Raised when a plan's input files changed since it was computed."""
+
+    def __init__(self, paths: list[str]) -> None:
+        super().__init__(f"Inputs changed since the plan was made: {', '.join(paths)}")
+        self.paths = paths
+
+
+class AnsibleStep(BaseModel):
+    """A playbook run belonging to a plan."""
+
+    playbook: str  # file name under playbooks/, e.g. "adduser.yaml"
+    vm_names: list[str]
+    username: Optional[str] = None  # tenant to delete (removeuser.yaml only)
+    before_files: bool = False  # run before the file changes are written
+    tags: Optional[list[str]] = None  # adduser.yaml stages to run (default: all)
+    pool_vm: Optional[str] = None  # warm pool VM renamed to vm_names[0] (adduser.yaml only)
+
+
+class Plan(BaseModel):
+    """Concrete changes of one command, computed once.
+
+    Holds the final content of every file the command writes (None for
+    deletions), the IP pairs and VFs it reserved, the ansible steps it runs and
+    a content hash of every input it read, so it can be saved, reviewed
+    and applied later only if nothing changed in between.
+    """
+
+    version: int = PLAN_VERSION
+    command: str  # e.g. "add user"
+    username: str
+    admin: Optional[str] = None
+    created: str
+    ip_allocations: dict[str, IPAllocation] = {}  # VM name -> reserved pair
+    vf_allocations: dict[str, VFAllocation] = {}  # VM name -> reserved SR-IOV VFs
+    changes: list[tuple[str, str]] = []  # (file, description) for the changes panel
+    files: dict[str, Optional[str]] = {}  # relative path -> new content, None deletes
+    inputs: dict[str, str] = {}  # relative path or glob -> sha256
+    ansible: list[AnsibleStep] = []
+    run_ansible: bool = False
+
+    @property
+    def vm_names(self) -> list[str]:
+        """VMs affected by the plan."""
+        names: list[str] = []
+        for step in self.ansible:
+            names += [vm for vm in step.vm_names if vm not in names]
+        return names or list(self.ip_allocations)
+
+
+def _relative(path: Path) -> str:
+    """Path relative to the repository root, as stored in plans."""
+    return str(path.relative_to(BASE_DIR))
+
+
+def hash_file(path: Path) -> str:
+    """Get the sha256 of a file's content, or ABSENT if it does not exist."""
+    if not path.exists():
+        return ABSENT
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def hash_glob(pattern: str) -> str:
+    """Get one sha256 over the names and contents of all files matching pattern."""
+    digest = hashlib.sha256()
+    for path in sorted(BASE_DIR.glob(pattern)):
+        digest.update(_relative(path).encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+class PlanBuilder:
+    """Collects the changes of a command against in-memory documents.
+
+    Each file is loaded at most once; mutations are made on the loaded
+    document and rendered to text only when the plan is built.
+    """
+
+    def __init__(self, command: str, username: str, admin: str | None = None) -> None:
+        self.plan = Plan(
+            command=command,
+            username=username,
+            admin=admin,
+            created=datetime.now().isoformat(timespec="seconds"),
+        )
+        self._docs: dict[Path, Any] = {}
+        self._dirty: dict[Path, Any] = {}
+
+    def load(self, path: Path) -> Any:
+        """Load a YAML document once and record its hash as a plan input."""
+        if path not in self._docs:
+            self.track(path)
+            self._docs[path] = load_yaml(path) if path.exists() else None
+        return self._docs[path]
+
+    def track(self, path: Path) -> None:
+        """Record a file the plan depends on without loading it."""
+        self.plan.inputs.setdefault(_relative(path), hash_file(path))
+
+    def track_glob(self, pattern: str) -> None:
+        """Record a set of files (e.g. those scanned for free IPs) as one input."""
+        self.plan.inputs.setdefault(pattern, hash_glob(pattern))
+
+    def write(self, path: Path, data: Any, description: str) -> None:
+        """Record that a document (or rendered text) must be written."""
+        self.track(path)
+        self._docs[path] = data
+        self._dirty[path] = data
+        self.plan.changes.append((_relative(path), description))
+
+    def delete(self, path: Path, description: str) -> None:
+        """Record that a file must be deleted."""
+        self.track(path)
+        self._docs[path] = None
+        self._dirty[path] = None
+        self.plan.changes.append((_relative(path), description))
+
+    def build(self) -> Plan:
+        """Render every modified document and return the finished plan."""
+        with span("render"):
+            for path, data in self._dirty.items():
+                if data is None or isinstance(data, str):
+                    self.plan.files[_relative(path)] = data
+                else:
+                    self.plan.files[_relative(path)] = dump_yaml_str(data)
+        return self.plan
+
+
+def stale_inputs(plan: Plan) -> list[str]:
+    """Get the plan inputs whose content changed since the plan was made."""
+    stale = []
+    for name, digest in plan.inputs.items():
+        if any(c in name for c in "*?["):
+            current = hash_glob(name)
+        else:
+            current = hash_file(BASE_DIR / name)
+        if current != digest:
+            stale.append(name)
+    return stale
+
+
+def apply_plan(plan: Plan) -> list[Path]:
+    """Write a plan's file changes in one transaction.
+
+    Args:
+        plan: Plan to apply
+
+    Returns:
+        List of paths that were written or deleted
+
+    Raises:
+        StalePlanError: If any input changed since the plan was computed
+    """
+    stale = stale_inputs(plan)
+    if stale:
+        raise StalePlanError(stale)
+
+    transaction = YamlTransaction()
+    for name, content in plan.files.items():
+        if content is None:
+            transaction.delete(BASE_DIR / name)
+        else:
+            transaction.save(BASE_DIR / name, content)
+
+    if not transaction:
+        return []
+    return transaction.commit()
+
+
+def save_plan(plan: Plan, path: Path) -> None:
+    """Write a plan to a JSON file."""
+    path.write_text(plan.model_dump_json(indent=2) + "\n")
+
+
+def load_plan(path: Path) -> Plan:
+    """Read a plan from a JSON file.
+
+    Raises:
+        ValueError: If the file is not a plan of a supported version
+    """
+    plan = Plan.model_validate_json(path.read_text())
+    if plan.version != PLAN_VERSION:
+        raise ValueError(f"Unsupported plan version {plan.version} (expected {PLAN_VERSION})")
+    return plan
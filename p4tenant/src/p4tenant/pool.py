@@ -0,0 +1,109 @@
+"""Warm pool of generic, booted VMs that new tenants claim instead of waiting for a fresh VM.
+
+Pool VMs are ordinary entries of host_vars/restsrv01.yaml `vms` (and of the
+inventory) named restvm-pool-NN, with their own dataplane IPs and no
+host_users. `vm_pool_size` in host_vars/restsrv01.yaml is the number of them
+`p4tenant pool fill` keeps. Claiming one renames it to the tenant's VM name.
+
+A pool VM is only claimed once its fill's provisioning succeeded, which sets
+`vm_pool_ready` in its host_vars; the next fill provisions the others again.
+
+The rename is written to the configuration before the vmclaim play renames
+the domain on restsrv01, so the new VM's host_vars record the pool VM in
+`vm_claimed_from` until the play succeeds: a failed claim is retried by the
+next provisioning run instead of defining a second VM with the same IPs.
+"""
+
+import re
+from typing import Any
+
+from .config import HOST_VARS_RESTSRV01, POOL_USERNAME, VM_PREFIX, get_host_vars_path
+from .yaml_editor import load_yaml, save_yaml
+
+POOL_VM_PATTERN = re.compile(rf"^{VM_PREFIX}-{POOL_USERNAME}-(\d+)$")
+
+# host_vars key of a VM whose claim from the pool is not done on the host yet
+CLAIMED_FROM_KEY = "vm_claimed_from"
+
+# host_vars key of a pool VM whose fill provisioning succeeded
+POOL_READY_KEY = "vm_pool_ready"
+
+# adduser.yaml plays that make a generic pool VM (no tenant user)
+POOL_STAGES = ["kvmconf", "vmboot"]
+
+
+def is_pool_vm(vm_name: str) -> bool:
+    """Check whether a VM belongs to the warm pool."""
+    return POOL_VM_PATTERN.match(vm_name) is not None
+
+
+def is_pool_vm_ready(vm_name: str) -> bool:
+    """Check whether a pool VM's fill provisioning succeeded."""
+    path = get_host_vars_path(vm_name)
+    data = load_yaml(path) if path.exists() else None
+    return bool((data or {}).get(POOL_READY_KEY))
+
+
+def list_pool_vms(srv_data: Any, ready: bool = False) -> list[str]:
+    """Get the unassigned pool VMs, oldest (lowest number) first.
+
+    Args:
+        srv_data: Loaded host_vars/restsrv01.yaml
+        ready: Only the VMs that can be claimed (vm_pool_ready)
+
+    Returns:
+        Pool VM names in claim order
+    """
+    pool = [str(vm) for vm in srv_data.get("vms") or [] if is_pool_vm(str(vm))]
+    if ready:
+        pool = [vm for vm in pool if is_pool_vm_ready(vm)]
+    return sorted(pool, key=lambda vm: int(POOL_VM_PATTERN.match(vm).group(1)))
+
+
+def get_pool_size(srv_data: Any) -> int:
+    """Get the number of pool VMs to keep (vm_pool_size, default 0)."""
+    return int(srv_data.get("vm_pool_size", 0))
+
+
+def get_pool_status() -> dict:
+    """Get the warm pool's target size and its VMs.
+
+    Returns:
+        Dictionary with the target size, {VM name: dataplane IPs} and the ready VMs
+    """
+    srv_data = load_yaml(HOST_VARS_RESTSRV01)
+    vms = {}
+    ready = []
+    for vm_name in list_pool_vms(srv_data):
+        path = get_host_vars_path(vm_name)
+        data = load_yaml(path) if path.exists() else None
+        vms[vm_name] = list((data or {}).get("dataplane_ipv4") or [])
+        if (data or {}).get(POOL_READY_KEY):
+            ready.append(vm_name)
+    return {"size": get_pool_size(srv_data), "vms": vms, "ready": ready}
+
+
+def get_pending_claim(vm_name: str) -> str | None:
+    """Get the pool VM a VM is still being renamed from, if its claim is pending."""
+    path = get_host_vars_path(vm_name)
+    data = load_yaml(path) if path.exists() else None
+    claimed_from = (data or {}).get(CLAIMED_FROM_KEY)
+    return str(claimed_from) if claimed_from else None
+
+
+def finish_claim(vm_name: str) -> None:
+    """Drop the pending claim marker once the pool VM is renamed on the host."""
+    path = get_host_vars_path(vm_name)
+    data = load_yaml(path) if path.exists() else None
+    if data and CLAIMED_FROM_KEY in data:
+        del data[CLAIMED_FROM_KEY]
+        save_yaml(path, data, backup=False)
+
+
+def mark_pool_vm_ready(vm_name: str) -> None:
+    """Let a pool VM be claimed once its fill provisioning succeeded."""
+    path = get_host_vars_path(vm_name)
+    data = load_yaml(path) if path.exists() else None
+    if data is not None and not data.get(POOL_READY_KEY):
+        data[POOL_READY_KEY] = True
+        save_yaml(path, data, backup=False)
@@ -0,0 +1,161 @@
+"""Per-phase timing and memory profiling for p4tenant commands."""
+
+import cProfile
+import io
+import json
+import pstats
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterator, Optional
+
+# Output file suffixes that are written as cProfile statistics
+PSTATS_SUFFIXES = {".pstats", ".prof"}
+
+
+@dataclass
+class Span:
+    """Aggregated timing for a named phase.
+
+    Repeated spans with the same name under the same parent are merged,
+    so loading twenty host_vars files shows up as one line with 20 calls.
+    """
+
+    name: str
+    calls: int = 0
+    total: float = 0.0
+    peak_bytes: int = 0
+    children: dict[str, "Span"] = field(default_factory=dict)
+
+    def to_dict(self) -> dict:
+        """Convert the span tree to plain dictionaries."""
+        return {
+            "name": self.name,
+            "calls": self.calls,
+            "total_ms": round(self.total * 1000, 3),
+            "peak_bytes": self.peak_bytes,
+            "children": [child.to_dict() for child in self.children.values()],
+        }
+
+
+class Profiler:
+    """Records nested timing spans for the running command.
+
+    Span timing is always collected (it only costs a perf_counter call),
+    cProfile and tracemalloc are only enabled on request.
+    """
+
+    def __init__(self) -> None:
+        self.root = Span("p4tenant")
+        self.enabled = False
+        self.output: Optional[Path] = None
+        self._cprofile: Optional[cProfile.Profile] = None
+        self._memory = False
+        # Stack of (span, start time, peak memory seen in this frame)
+        self._stack: list[list] = [[self.root, time.perf_counter(), 0]]
+
+    def start(
+        self,
+        enabled: bool = False,
+        output: Optional[Path] = None,
+        use_cprofile: bool = False,
+        memory: bool = False,
+    ) -> None:
+        """Start profiling the current command.
+
+        Args:
+            enabled: Print the span breakdown when the command finishes
+            output: Optional file to write (.json for spans, .pstats for cProfile)
+            use_cprofile: Collect function-level statistics with cProfile
+            memory: Track peak memory per span with tracemalloc
+        """
+        self.enabled = enabled or output is not None
+        self.output = output
+        if output is not None and output.suffix in PSTATS_SUFFIXES:
+            use_cprofile = True
+
+        if memory:
+            self._memory = True
+            tracemalloc.start()
+
+        if use_cprofile:
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+
+        self._stack = [[self.root, time.perf_counter(), 0]]
+
+    def stop(self) -> None:
+        """Stop collecting and close the root span."""
+        if self._cprofile is not None:
+            self._cprofile.disable()
+
+        root, start, mem_max = self._stack[0]
+        root.calls = 1
+        root.total = time.perf_counter() - start
+        if self._memory:
+            root.peak_bytes = max(mem_max, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[Span]:
+        """Time a phase nested under the currently open span."""
+        frame = self._stack[-1]
+        node = frame[0].children.get(name)
+        if node is None:
+            node = Span(name)
+            frame[0].children[name] = node
+
+        if self._memory:
+            frame[2] = max(frame[2], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+
+        self._stack.append([node, time.perf_counter(), 0])
+        try:
+            yield node
+        finally:
+            _, start, mem_max = self._stack.pop()
+            node.calls += 1
+            node.total += time.perf_counter() - start
+            if self._memory:
+                peak = max(mem_max, tracemalloc.get_traced_memory()[1])
+                node.peak_bytes = max(node.peak_bytes, peak)
+                frame[2] = max(frame[2], peak)
+                tracemalloc.reset_peak()
+
+    def phase_durations(self) -> dict[str, float]:
+        """Get total seconds spent in each top-level phase."""
+        return {name: span.total for name, span in self.root.children.items()}
+
+    def cprofile_text(self, limit: int = 15) -> str | None:
+        """Get the top cProfile entries sorted by cumulative time."""
+        if self._cprofile is None:
+            return None
+        stream = io.StringIO()
+        stats = pstats.Stats(self._cprofile, stream=stream)
+        stats.sort_stats("cumulative").print_stats(limit)
+        return stream.getvalue()
+
+    def write(self, path: Path) -> None:
+        """Write the collected profile to a file.
+
+        Args:
+            path: Destination; .pstats/.prof writes cProfile data, anything
+                else writes the span tree as JSON
+        """
+        if path.suffix in PSTATS_SUFFIXES and self._cprofile is not None:
+            self._cprofile.dump_stats(str(path))
+            return
+
+        with open(path, "w") as f:
+            json.dump(self.root.to_dict(), f, indent=2)
+
+
+# Process-wide profiler, started by the CLI callback
+profiler = Profiler()
+
+
+def span(name: str):
+    """Time a phase of the current command (see Profiler.span)."""
+    return profiler.span(name)
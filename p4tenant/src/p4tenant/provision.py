@@ -0,0 +1,217 @@
+"""Concurrent ansible provisioning with per-host safety rules and live progress."""
+
+import asyncio
+import json
+import re
+import time
+from contextlib import nullcontext
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from rich.live import Live
+
+from .ansible_env import get_ansible_env
+from .config import BASE_DIR, DEFAULT_CONCURRENCY, LOG_DIR, get_host_vars_path
+from .inventory import create_minimal_inventory
+from .metrics import run_metrics
+from .pool import POOL_STAGES, finish_claim, get_pending_claim, is_pool_vm, mark_pool_vm_ready
+from .ui import console, create_provision_table
+from .yaml_editor import load_yaml
+
+# adduser.yaml plays run per VM, in order. Plays that touch a shared host
+# hold that host's lock, so e.g. only one libvirt define runs on restsrv01
+# at a time; plays without a lock run fully in parallel.
+PROVISION_STAGES: list[tuple[str, Optional[str]]] = [
+    ("kvmconf", "restsrv01"),  # libvirt define + virt-customize on the hypervisor
+    ("p4conf", "p4switches"),  # user bootstrap on the shared switches
+    ("vmboot", None),  # bootstrap + netplan inside the VM itself
+    ("srvuseradd", "restsrv01"),  # server users and the webapp users.csv
+    ("vmsnap", "restsrv01"),  # snapshot of the provisioned VM for `p4tenant reset`
+]
+
+# Replaces kvmconf for VMs claimed from the warm pool: rename the booted pool VM
+CLAIM_STAGE: tuple[str, Optional[str]] = ("vmclaim", "restsrv01")
+
+# Stages only configure the VM, its hypervisor and the switches, each on its
+# own: no host waits for the slowest one after every task
+PROVISION_STRATEGY = "free"
+
+# "TASK [role : name] ****" lines in ansible-playbook output
+TASK_LINE = re.compile(r"^TASK \[(.+?)\]")
+
+
+@dataclass
+class VMRun:
+    """Progress of one VM's provisioning."""
+
+    vm_name: str
+    log_path: Path
+    stage: str = "-"
+    task: str = ""
+    status: str = "queued"  # queued, waiting, running, ok, failed
+    returncode: Optional[int] = None
+    started: Optional[float] = None
+    finished: Optional[float] = None
+
+    @property
+    def elapsed(self) -> float:
+        """Seconds since the run started (until it finished)."""
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.monotonic()) - self.started
+
+
+def get_vm_users(vm_name: str) -> list[str]:
+    """Get the tenant users of a VM (host_users in its host_vars)."""
+    path = get_host_vars_path(vm_name)
+    data = load_yaml(path) if path.exists() else None
+    return [str(user) for user in (data or {}).get("host_users") or []]
+
+
+class Provisioner:
+    """Runs adduser.yaml for several VMs concurrently.
+
+    Each VM gets its own minimal inventory and log file. At most
+    `concurrency` ansible-playbook processes run at once, and stages that
+    touch a shared host are serialised by that host's lock.
+    """
+
+    def __init__(
+        self,
+        admin_user: str,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        playbook: Path = BASE_DIR / "playbooks" / "adduser.yaml",
+        stages: list[tuple[str, Optional[str]]] = PROVISION_STAGES,
+        force_bootstrap: bool = False,
+        claims: Optional[dict[str, str]] = None,
+    ) -> None:
+        self.admin_user = admin_user
+        self.force_bootstrap = force_bootstrap
+        self.claims = claims or {}  # VM name -> warm pool VM it is renamed from
+        self.concurrency = max(1, concurrency)
+        self.playbook = playbook
+        self.stages = stages
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._locks: dict[str, asyncio.Lock] = {}
+
+    async def _run_stage(self, run: VMRun, tag: str, inventory: Path, extra_vars: dict, log) -> int:
+        """Run one tagged stage of the playbook, streaming output to the log."""
+        cmd = ["ansible-playbook", str(self.playbook), "-i", str(inventory), "--tags", tag]
+        cmd += ["-e", json.dumps(extra_vars)]
+        log.write(f"$ {' '.join(cmd)}\n".encode())
+
+        proc = await asyncio.create_subprocess_exec(
+            *cmd,
+            cwd=str(BASE_DIR),
+            env=get_ansible_env(inventory, PROVISION_STRATEGY),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+        )
+        async for line in proc.stdout:
+            log.write(line)
+            match = TASK_LINE.match(line.decode(errors="replace"))
+            if match:
+                run.task = match.group(1)
+
+        return await proc.wait()
+
+    async def _provision(self, run: VMRun) -> None:
+        """Run every stage for one VM, stopping at the first failure."""
+        inventory = create_minimal_inventory(run.vm_name, self.admin_user)
+        run.started = time.monotonic()
+        # Only define/start this VM on the hypervisor, not every VM it hosts,
+        # and only bootstrap its users on the switches, not every tenant
+        extra_vars = {"target_vms": [run.vm_name], "target_users": get_vm_users(run.vm_name)}
+        if self.force_bootstrap:
+            extra_vars["bootstrap_force"] = True
+        stages = self.stages
+        # Claims of this run, or ones a previous run failed to finish
+        pool_vm = self.claims.get(run.vm_name) or get_pending_claim(run.vm_name)
+        if pool_vm:
+            extra_vars["pool_vm"] = pool_vm
+            stages = [CLAIM_STAGE if tag == "kvmconf" else (tag, host) for tag, host in stages]
+
+        try:
+            with open(run.log_path, "wb") as log:
+                for tag, host in stages:
+                    run.stage, run.task, run.status = tag, "", "waiting"
+                    lock = self._locks.setdefault(host, asyncio.Lock()) if host else nullcontext()
+
+                    # Take the host lock before a slot, so waiting VMs don't hold slots
+                    async with lock:
+                        async with self._slots:
+                            run.status = "running"
+                            try:
+                                run.returncode = await self._run_stage(run, tag, inventory, extra_vars, log)
+                            except FileNotFoundError:
+                                log.write(b"ansible-playbook not found. Is Ansible installed?\n")
+                                run.returncode = 127
+
+                    if run.returncode != 0:
+                        run.status = "failed"
+                        return
+                    if (tag, host) == CLAIM_STAGE:
+                        finish_claim(run.vm_name)
+
+                # A pool VM can be claimed once every play of its fill succeeded
+                if is_pool_vm(run.vm_name) and set(POOL_STAGES) <= {tag for tag, _ in stages}:
+                    mark_pool_vm_ready(run.vm_name)
+                run.stage, run.task, run.status = "done", "", "ok"
+        finally:
+            run.finished = time.monotonic()
+            run_metrics.add_ansible_exit(run.returncode if run.returncode is not None else 1)
+            inventory.unlink(missing_ok=True)
+
+    async def run_all(self, vm_names: list[str]) -> list[VMRun]:
+        """Provision all VMs, rendering a live status table.
+
+        Args:
+            vm_names: VMs to provision
+
+        Returns:
+            One VMRun per VM, in the given order
+        """
+        self._slots = asyncio.Semaphore(self.concurrency)
+        LOG_DIR.mkdir(parents=True, exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        runs = [VMRun(vm, LOG_DIR / f"{vm}_{timestamp}.log") for vm in vm_names]
+
+        with Live(create_provision_table(runs), console=console, refresh_per_second=4) as live:
+            tasks = [asyncio.create_task(self._provision(run)) for run in runs]
+            while not all(task.done() for task in tasks):
+                live.update(create_provision_table(runs))
+                await asyncio.sleep(0.25)
+            live.update(create_provision_table(runs))
+
+        # Surface unexpected errors (e.g. a log that can't be written)
+        for task in tasks:
+            task.result()
+        return runs
+
+
+def provision_vms(
+    vm_names: list[str],
+    admin_user: str,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    force_bootstrap: bool = False,
+    tags: Optional[list[str]] = None,
+    claims: Optional[dict[str, str]] = None,
+) -> list[VMRun]:
+    """Provision VMs concurrently (see Provisioner).
+
+    Args:
+        vm_names: VMs to provision
+        admin_user: Admin username for SSH connections
+        concurrency: Maximum number of concurrent ansible-playbook processes
+        force_bootstrap: Ignore the bootstrap role's state markers on the hosts
+        tags: Only run these stages (default: all of PROVISION_STAGES)
+        claims: VMs renamed from warm pool VMs, mapped to the pool VM
+
+    Returns:
+        One VMRun per VM
+    """
+    stages = [stage for stage in PROVISION_STAGES if tags is None or stage[0] in tags]
+    provisioner = Provisioner(admin_user, concurrency, stages=stages, force_bootstrap=force_bootstrap, claims=claims)
+    return asyncio.run(provisioner.run_all(vm_names))
@@ -0,0 +1,231 @@
+"""SR-IOV virtual function (VF) allocation for tenant VMs.
+
+VFs are declared per physical function (PF) in host_vars/restsrv01.yaml:
+`sriov` gives each PF's `num_vfs`, and `sriov_vf_allocation` maps VMs to
+the VF indices they get as PCI passthrough devices. Each PF's allocated
+VFs are tracked as a bitmap (bit i set = VF i taken).
+"""
+
+import re
+from typing import Any
+
+from ruamel.yaml.comments import CommentedMap, CommentedSeq
+
+from .config import HOST_VARS_RESTSRV01
+from .models import VFAllocation
+from .yaml_editor import load_yaml
+
+# VF count used by the kvm-sriov role when a pool has no num_vfs
+DEFAULT_NUM_VFS = 4
+
+
+def parse_sriov_request(spec: str) -> tuple[str, int]:
+    """Parse a --sriov request like "ens5f1:2".
+
+    Args:
+        spec: "PF:N" with the PF interface name and the number of VFs
+
+    Returns:
+        Tuple of (PF interface, VF count)
+
+    Raises:
+        ValueError: If the request is malformed
+    """
+    match = re.fullmatch(r"([A-Za-z0-9_.-]+):(\d+)", spec.strip())
+    if not match or int(match.group(2)) < 1:
+        raise ValueError(f"Invalid SR-IOV request '{spec}' (expected PF:N, e.g. ens5f1:2)")
+    return match.group(1), int(match.group(2))
+
+
+def get_pf_sizes(srv_data: Any) -> dict[str, int]:
+    """Get the number of VFs created on each PF.
+
+    Args:
+        srv_data: Loaded host_vars/restsrv01.yaml
+
+    Returns:
+        Dictionary mapping PF interface to its num_vfs
+    """
+    return {
+        str(pool["pf_iface"]): int(pool.get("num_vfs", DEFAULT_NUM_VFS))
+        for pool in srv_data.get("sriov") or []
+        if pool.get("pf_iface")
+    }
+
+
+def get_pool_vms(srv_data: Any) -> dict[str, list[str]]:
+    """Get the VMs attached to each PF's libvirt hostdev pool.
+
+    libvirt picks a free VF of the PF for each of them when they start, so
+    they use up VFs without owning a fixed index.
+    """
+    return {
+        str(pool["pf_iface"]): list(pool.get("vms") or [])
+        for pool in srv_data.get("sriov") or []
+        if pool.get("pf_iface")
+    }
+
+
+def get_vf_owners(srv_data: Any) -> dict[str, dict[int, list[str]]]:
+    """Map every statically allocated VF to the VMs it is assigned to.
+
+    Args:
+        srv_data: Loaded host_vars/restsrv01.yaml
+
+    Returns:
+        Dictionary mapping PF to {VF index: [VM names]}
+    """
+    owners: dict[str, dict[int, list[str]]] = {}
+    for vm_name, pfs in (srv_data.get("sriov_vf_allocation") or {}).items():
+        for pf, vfs in (pfs or {}).items():
+            for vf in vfs or []:
+                owners.setdefault(str(pf), {}).setdefault(int(vf), []).append(str(vm_name))
+    return owners
+
+
+def get_vf_bitmaps(srv_data: Any) -> dict[str, int]:
+    """Get the bitmap of allocated VFs of every PF.
+
+    Args:
+        srv_data: Loaded host_vars/restsrv01.yaml
+
+    Returns:
+        Dictionary mapping PF to a bitmap with bit i set if VF i is allocated
+    """
+    bitmaps = {pf: 0 for pf in get_pf_sizes(srv_data)}
+    for pf, vfs in get_vf_owners(srv_data).items():
+        for vf in vfs:
+            bitmaps[pf] = bitmaps.get(pf, 0) | (1 << vf)
+    return bitmaps
+
+
+def find_free_range(bitmap: int, num_vfs: int, count: int) -> int | None:
+    """Find the first run of count free VFs.
+
+    Args:
+        bitmap: Allocated VFs (bit i set = VF i taken)
+        num_vfs: Number of VFs on the PF
+        count: Number of contiguous VFs needed
+
+    Returns:
+        Index of the first VF of the range, or None if no range is free
+    """
+    mask = (1 << count) - 1
+    for start in range(num_vfs - count + 1):
+        if not bitmap & (mask << start):
+            return start
+    return None
+
+
+def allocate_vfs(srv_data: Any, pf: str, count: int) -> VFAllocation | None:
+    """Allocate a contiguous range of VFs on a PF.
+
+    VMs in the PF's hostdev pool each keep one VF spare for libvirt.
+
+    Args:
+        srv_data: Loaded host_vars/restsrv01.yaml
+        pf: PF interface, e.g. "ens5f1"
+        count: Number of VFs
+
+    Returns:
+        VFAllocation, or None if the PF has not enough free VFs
+
+    Raises:
+        ValueError: If the PF is not declared in sriov
+    """
+    sizes = get_pf_sizes(srv_data)
+    if pf not in sizes:
+        raise ValueError(f"PF '{pf}' is not declared in restsrv01 sriov (known: {', '.join(sizes) or 'none'})")
+
+    bitmap = get_vf_bitmaps(srv_data)[pf]
+    free = sizes[pf] - bin(bitmap).count("1") - len(get_pool_vms(srv_data)[pf])
+    if free < count:
+        return None
+
+    start = find_free_range(bitmap, sizes[pf], count)
+    if start is None:
+        return None
+    return VFAllocation(pf=pf, vfs=list(range(start, start + count)))
+
+
+def add_vf_allocation(srv_data: Any, vm_name: str, vf_alloc: VFAllocation) -> None:
+    """Record a VM's VFs in sriov_vf_allocation."""
+    if srv_data.get("sriov_vf_allocation") is None:
+        srv_data["sriov_vf_allocation"] = CommentedMap()
+
+    vfs = CommentedSeq(vf_alloc.vfs)
+    vfs.fa.set_flow_style()  # [0, 1] like the hand-written entries
+    srv_data["sriov_vf_allocation"].setdefault(vm_name, CommentedMap())[vf_alloc.pf] = vfs
+
+
+def remove_vf_allocation(srv_data: Any, vm_name: str) -> list[VFAllocation]:
+    """Release a VM's VFs from sriov_vf_allocation.
+
+    Returns:
+        The released allocations (empty if the VM had none)
+    """
+    allocation = srv_data.get("sriov_vf_allocation") or {}
+    if vm_name not in allocation:
+        return []
+    released = [VFAllocation(pf=str(pf), vfs=list(vfs or [])) for pf, vfs in (allocation[vm_name] or {}).items()]
+    del allocation[vm_name]
+    return released
+
+
+def find_vf_conflicts(srv_data: Any) -> list[str]:
+    """Find VFs assigned twice or outside their PF.
+
+    Args:
+        srv_data: Loaded host_vars/restsrv01.yaml
+
+    Returns:
+        List of problem descriptions
+    """
+    problems = []
+    sizes = get_pf_sizes(srv_data)
+    for pf, owners in sorted(get_vf_owners(srv_data).items()):
+        if pf not in sizes:
+            problems.append(f"{pf} is used in sriov_vf_allocation but not declared in sriov")
+            continue
+        for vf, vms in sorted(owners.items()):
+            if len(vms) > 1:
+                problems.append(f"{pf} VF {vf} is assigned to {', '.join(vms)}")
+            if vf >= sizes[pf]:
+                problems.append(f"{pf} VF {vf} of {', '.join(vms)} is beyond num_vfs ({sizes[pf]})")
+    return problems
+
+
+def get_sriov_status() -> list[dict]:
+    """Get the VF utilisation of every PF.
+
+    Returns:
+        One dictionary per PF with its pool, size, used/free counts, the
+        largest free contiguous range and the VMs using it
+    """
+    srv_data = load_yaml(HOST_VARS_RESTSRV01)
+    sizes = get_pf_sizes(srv_data)
+    bitmaps = get_vf_bitmaps(srv_data)
+    owners = get_vf_owners(srv_data)
+    pool_vms = get_pool_vms(srv_data)
+    names = {str(pool["pf_iface"]): pool.get("name", "") for pool in srv_data.get("sriov") or [] if pool.get("pf_iface")}
+
+    status = []
+    for pf, num_vfs in sizes.items():
+        bitmap = bitmaps.get(pf, 0)
+        largest = next((n for n in range(num_vfs, 0, -1) if find_free_range(bitmap, num_vfs, n) is not None), 0)
+        assigned: dict[str, list[int]] = {}
+        for vf, vms in sorted(owners.get(pf, {}).items()):
+            for vm in vms:
+                assigned.setdefault(vm, []).append(vf)
+        status.append({
+            "pf": pf,
+            "pool": names[pf],
+            "num_vfs": num_vfs,
+            "map": "".join("#" if bitmap & (1 << vf) else "." for vf in range(num_vfs)),
+            "static": bin(bitmap).count("1"),
+            "pool_vms": pool_vms.get(pf, []),
+            "free": num_vfs - bin(bitmap).count("1") - len(pool_vms.get(pf, [])),
+            "largest_free_range": largest,
+            "assigned": assigned,
+        })
+    return status
@@ -6,20 +6,35 @@ from typing import Any
 from ruamel.yaml.comments import CommentedMap, CommentedSeq
 
 from .config import (
+    ADMIN_OVERRIDES_FILE,
     DEFAULT_ANSIBLE_USER,
+    DEFAULT_DATAPLANE_MTU,
     GROUP_VARS_ALL,
     HOST_VARS_DIR,
     HOST_VARS_RESTSRV01,
     INVENTORY_FILE,
-    PROXY_COMMAND,
+    MIN_DATAPLANE_MTU,
+    POOL_USERNAME,
     VM_PREFIX,
     get_host_vars_path,
     get_next_vm_number,
     get_vm_name,
 )
-from .ip_allocator import allocate_ip_pair
-from .models import IPAllocation, TenantInput
-from .yaml_editor import load_yaml, save_yaml
+from .capacity import allocate_cpus, check_hugepages, get_default_resources, get_pf_numa_node
+from .inventory import render_admin_inventories
+from .models import CPUPinning, IPAllocation, TenantInput, VMResources
+from .plan import AnsibleStep, Plan, PlanBuilder
+from .pool import (
+    CLAIMED_FROM_KEY,
+    POOL_READY_KEY,
+    POOL_STAGES,
+    get_pending_claim,
+    get_pool_size,
+    is_pool_vm_ready,
+    list_pool_vms,
+)
+from .sriov_allocator import add_vf_allocation, allocate_vfs, remove_vf_allocation
+from .yaml_editor import load_yaml
 
 
 class ValidationError(Exception):
@@ -43,6 +58,9 @@ class TenantManager:
         """
         errors = []
 
+        if username == POOL_USERNAME:
+            errors.append(f"Username '{username}' is reserved for the warm VM pool")
+
         # Check restart_users
         all_data = load_yaml(GROUP_VARS_ALL)
         if username in all_data.get("restart_users", []):
@@ -128,205 +146,330 @@ class TenantManager:
         next_num = get_next_vm_number(username, existing_vms)
         return get_vm_name(username, next_num)
 
-    def add_tenant(
+    def plan_add_tenant(
         self,
         tenant: TenantInput,
         ip_allocations: list[IPAllocation],
-        dry_run: bool = False,
-    ) -> list[tuple[str, str]]:
-        """Add a new tenant to all configuration files.
+        admin: str | None = None,
+        pool_vms: list[str] | None = None,
+    ) -> Plan:
+        """Plan adding a new tenant to all configuration files.
 
         Args:
             tenant: Validated tenant input
-            ip_allocations: List of allocated IPs for each VM
-            dry_run: If True, only return changes without applying
+            ip_allocations: List of allocated IPs for each VM not claimed from the pool
+            admin: Admin user running the command
+            pool_vms: Warm pool VMs claimed as the tenant's first VMs
 
         Returns:
-            List of (file_path, description) for changes made
+            Plan with the file changes and provisioning steps
         """
-        changes = []
-        num_vms = len(ip_allocations)
+        builder = PlanBuilder("add user", tenant.username, admin)
+        builder.track_glob(f"host_vars/{VM_PREFIX}-*.yaml")
 
         # 1. Add to restart_users in group_vars/all.yaml
-        changes.append(
-            (
-                "group_vars/all.yaml",
-                f"Add '{tenant.username}' to restart_users",
-            )
-        )
-        if not dry_run:
-            self._add_to_restart_users(tenant.username)
+        all_data = builder.load(GROUP_VARS_ALL)
+        self._add_to_restart_users(all_data, tenant.username)
+        builder.write(GROUP_VARS_ALL, all_data, f"Add '{tenant.username}' to restart_users")
 
         # 2-4. For each VM, add to vms list, create host_vars, add to inventory
-        for vm_num, ip_alloc in enumerate(ip_allocations, 1):
+        # (or rename a claimed pool VM in all of them)
+        vm_names = []
+        pool_vms = pool_vms or []
+        for vm_num, pool_vm in enumerate(pool_vms, 1):
             vm_name = get_vm_name(tenant.username, vm_num)
+            self._plan_claim_pool_vm(builder, tenant.username, pool_vm, vm_name)
+            vm_names.append(vm_name)
+        for vm_num, ip_alloc in enumerate(ip_allocations, len(pool_vms) + 1):
+            vm_name = get_vm_name(tenant.username, vm_num)
+            self._plan_new_vm(builder, tenant.username, vm_name, ip_alloc)
+            vm_names.append(vm_name)
+
+        self._plan_admin_inventories(builder, f"adds {_quoted(vm_names)}")
+        claimed = dict(zip(vm_names, pool_vms))
+        builder.plan.ansible = [
+            AnsibleStep(playbook="adduser.yaml", vm_names=[vm], pool_vm=claimed.get(vm)) for vm in vm_names
+        ]
+        return builder.build()
+
+    def plan_fill_pool(self, ip_allocations: list[IPAllocation], size: int, admin: str | None = None) -> Plan:
+        """Plan adding VMs to the warm pool.
 
-            # Add VM to vms list in host_vars/restsrv01.yaml
-            changes.append(
-                (
-                    "host_vars/restsrv01.yaml",
-                    f"Add '{vm_name}' to vms list",
-                )
-            )
-            if not dry_run:
-                self._add_to_restsrv01_vms(vm_name)
-
-            # Create host_vars/restvm-{user}-{nn}.yaml
-            changes.append(
-                (
-                    f"host_vars/{vm_name}.yaml",
-                    f"[NEW] Create with dataplane_ipv4 ({ip_alloc.ip1}, {ip_alloc.ip2})",
-                )
-            )
-            if not dry_run:
-                self._create_host_vars(tenant.username, vm_name, ip_alloc)
-
-            # Add to inventory.yaml
-            changes.append(
-                (
-                    "inventory.yaml",
-                    f"Add '{vm_name}' to vms.hosts",
-                )
-            )
-            if not dry_run:
-                self._add_to_inventory(vm_name)
-
-        return changes
-
-    def add_vm(
+        Args:
+            ip_allocations: Allocated IPs for each new pool VM
+            size: Number of pool VMs to keep, recorded as vm_pool_size
+            admin: Admin user running the command
+
+        Returns:
+            Plan with the file changes and the provisioning steps of the new pool VMs
+            and of pool VMs whose earlier fill failed
+        """
+        builder = PlanBuilder("pool fill", POOL_USERNAME, admin)
+        builder.track_glob(f"host_vars/{VM_PREFIX}-*.yaml")
+
+        srv_data = builder.load(HOST_VARS_RESTSRV01)
+        if get_pool_size(srv_data) != size:
+            srv_data["vm_pool_size"] = size
+            builder.write(HOST_VARS_RESTSRV01, srv_data, f"Set vm_pool_size to {size}")
+
+        existing = list_pool_vms(srv_data)
+        # Not ready: provisioning failed or was interrupted, run it again
+        vm_names = [vm for vm in existing if not is_pool_vm_ready(vm)]
+        new_vms = []
+        for ip_alloc in ip_allocations:
+            vm_name = get_vm_name(POOL_USERNAME, get_next_vm_number(POOL_USERNAME, existing + new_vms))
+            self._plan_new_vm(builder, None, vm_name, ip_alloc)
+            new_vms.append(vm_name)
+        vm_names += new_vms
+
+        if new_vms:
+            self._plan_admin_inventories(builder, f"adds {_quoted(new_vms)}")
+        # Generic VMs: created and bootstrapped, without any tenant user
+        builder.plan.ansible = [
+            AnsibleStep(playbook="adduser.yaml", vm_names=[vm], tags=list(POOL_STAGES)) for vm in vm_names
+        ]
+        return builder.build()
+
+    def plan_add_vm(
         self,
         username: str,
         vm_name: str,
         ip_alloc: IPAllocation,
-        dry_run: bool = False,
-    ) -> list[tuple[str, str]]:
-        """Add a new VM for an existing user.
+        admin: str | None = None,
+        sriov: tuple[str, int] | None = None,
+        resources: VMResources | None = None,
+        pin: bool = False,
+        hugepages: str | None = None,
+        mtu: int | None = None,
+    ) -> Plan:
+        """Plan adding a new VM for an existing user.
 
         Args:
             username: The existing tenant username
             vm_name: Name for the new VM
             ip_alloc: Allocated IPs for the VM
-            dry_run: If True, only return changes without applying
+            admin: Admin user running the command
+            sriov: Optional (PF, count) of SR-IOV VFs to pass through to the VM
+            resources: Optional vCPUs/RAM for the VM (default: kvm_provision defaults)
+            pin: Pin each vCPU to a dedicated host CPU on one NUMA node (the
+                SR-IOV PF's node if known)
+            hugepages: Back the VM's memory with hugepages of this size ("1G" or "2M")
+            mtu: Dataplane MTU of the VM (default: 1500)
 
         Returns:
-            List of (file_path, description) for changes made
-        """
-        changes = []
-
-        # 1. Add VM to vms list in host_vars/restsrv01.yaml
-        changes.append(
-            (
-                "host_vars/restsrv01.yaml",
-                f"Add '{vm_name}' to vms list",
-            )
-        )
-        if not dry_run:
-            self._add_to_restsrv01_vms(vm_name)
-
-        # 2. Create host_vars/{vm_name}.yaml
-        changes.append(
-            (
-                f"host_vars/{vm_name}.yaml",
-                f"[NEW] Create with dataplane_ipv4 ({ip_alloc.ip1}, {ip_alloc.ip2})",
-            )
-        )
-        if not dry_run:
-            self._create_host_vars(username, vm_name, ip_alloc)
-
-        # 3. Add to inventory.yaml
-        changes.append(
-            (
-                "inventory.yaml",
-                f"Add '{vm_name}' to vms.hosts",
-            )
-        )
-        if not dry_run:
-            self._add_to_inventory(vm_name)
+            Plan with the file changes and provisioning step
 
-        return changes
-
-    def remove_tenant(
+        Raises:
+            ValidationError: If the requested VFs, CPUs or hugepages can't be
+                allocated, or the MTU exceeds the dataplane MTU
+        """
+        builder = PlanBuilder("add vm", username, admin)
+        builder.track_glob(f"host_vars/{VM_PREFIX}-*.yaml")
+
+        pinning = None
+        if pin:
+            vcpus = (resources or get_default_resources()).vcpus
+            pinning = self._allocate_pinning(builder, vcpus, sriov[0] if sriov else None)
+        if hugepages:
+            self._check_hugepages(builder, hugepages, (resources or get_default_resources()).ram_mb)
+        if mtu:
+            self._check_mtu(builder, mtu)
+
+        self._plan_new_vm(builder, username, vm_name, ip_alloc, resources, pinning, hugepages, mtu)
+        if sriov:
+            self._plan_vf_allocation(builder, vm_name, *sriov)
+
+        self._plan_admin_inventories(builder, f"adds {_quoted([vm_name])}")
+        builder.plan.ansible = [AnsibleStep(playbook="adduser.yaml", vm_names=[vm_name])]
+        return builder.build()
+
+    def plan_remove_tenant(
         self,
         username: str,
         vm_names: list[str] | None = None,
-        dry_run: bool = False,
-    ) -> list[tuple[str, str]]:
-        """Remove a tenant or specific VMs from all configuration files.
+        admin: str | None = None,
+        update_config: bool = True,
+    ) -> Plan:
+        """Plan removing a tenant or specific VMs.
 
         Args:
             username: Username to remove
             vm_names: Optional list of specific VM names to remove. If None, removes all VMs for the user.
-            dry_run: If True, only return changes without applying
+            admin: Admin user for the removal playbook
+            update_config: If False, only the removal playbook is planned
 
         Returns:
-            List of (file_path, description) for changes made
+            Plan with the file changes and the removal playbook step
         """
-        changes = []
+        builder = PlanBuilder("remove", username, admin)
 
         # Get all VMs for this user if specific VMs not provided
+        all_user_vms = self.get_user_vms(username)
         if vm_names is None:
-            vm_names = self.get_user_vms(username)
             # Fallback to default VM name if no VMs found
-            if not vm_names:
-                vm_names = [get_vm_name(username, 1)]
+            vm_names = all_user_vms or [get_vm_name(username, 1)]
+
+        if vm_names:
+            # A VM whose claim never completed still runs under its pool VM name
+            targets = vm_names + [pool_vm for vm in vm_names if (pool_vm := get_pending_claim(vm))]
+            builder.plan.ansible = [
+                AnsibleStep(playbook="removeuser.yaml", vm_names=targets, username=username, before_files=True)
+            ]
+
+        if not update_config:
+            return builder.build()
 
         # Determine if we're removing ALL user's VMs
-        all_user_vms = self.get_user_vms(username)
         removing_all_vms = set(vm_names) == set(all_user_vms) if all_user_vms else True
 
         # 1. Remove from restart_users only if removing ALL VMs
         if removing_all_vms:
-            all_data = load_yaml(GROUP_VARS_ALL)
-            if username in all_data.get("restart_users", []):
-                changes.append(
-                    (
-                        "group_vars/all.yaml",
-                        f"Remove '{username}' from restart_users",
-                    )
-                )
-                if not dry_run:
-                    self._remove_from_restart_users(username)
+            all_data = builder.load(GROUP_VARS_ALL)
+            if self._remove_from_restart_users(all_data, username):
+                builder.write(GROUP_VARS_ALL, all_data, f"Remove '{username}' from restart_users")
 
         # 2-4. For each VM, remove from vms list, delete host_vars, remove from inventory
+        srv_data = builder.load(HOST_VARS_RESTSRV01)
+        inv_data = builder.load(INVENTORY_FILE)
+        removed = []
         for vm_name in vm_names:
             # 2. Remove from restsrv01 vms
-            srv_data = load_yaml(HOST_VARS_RESTSRV01)
-            if vm_name in srv_data.get("vms", []):
-                changes.append(
-                    (
-                        "host_vars/restsrv01.yaml",
-                        f"Remove '{vm_name}' from vms list",
-                    )
-                )
-                if not dry_run:
-                    self._remove_from_restsrv01_vms(vm_name)
+            if self._remove_from_restsrv01_vms(srv_data, vm_name):
+                builder.write(HOST_VARS_RESTSRV01, srv_data, f"Remove '{vm_name}' from vms list")
+
+            # Release the VM's SR-IOV VFs
+            for vf_alloc in remove_vf_allocation(srv_data, vm_name):
+                builder.write(HOST_VARS_RESTSRV01, srv_data, f"Release {vf_alloc.label} of '{vm_name}'")
 
             # 3. Delete host_vars file
             host_vars_path = get_host_vars_path(vm_name)
             if host_vars_path.exists():
-                changes.append(
-                    (
-                        f"host_vars/{vm_name}.yaml",
-                        "[DELETE] Remove host vars file",
-                    )
-                )
-                if not dry_run:
-                    self._delete_host_vars(vm_name)
+                builder.delete(host_vars_path, "[DELETE] Remove host vars file")
 
             # 4. Remove from inventory
-            inv_data = load_yaml(INVENTORY_FILE)
-            vms_hosts = inv_data.get("vms", {}).get("hosts", {})
-            if vm_name in vms_hosts:
-                changes.append(
-                    (
-                        "inventory.yaml",
-                        f"Remove '{vm_name}' from vms.hosts",
-                    )
-                )
-                if not dry_run:
-                    self._remove_from_inventory(vm_name)
+            if self._remove_from_inventory(inv_data, vm_name):
+                builder.write(INVENTORY_FILE, inv_data, f"Remove '{vm_name}' from vms.hosts")
+                removed.append(vm_name)
 
-        return changes
+        if removed:
+            self._plan_admin_inventories(builder, f"removes {_quoted(removed)}")
+        return builder.build()
+
+    def _plan_new_vm(
+        self,
+        builder: PlanBuilder,
+        username: str | None,
+        vm_name: str,
+        ip_alloc: IPAllocation,
+        resources: VMResources | None = None,
+        pinning: CPUPinning | None = None,
+        hugepages: str | None = None,
+        mtu: int | None = None,
+    ) -> None:
+        """Add the vms list, host_vars and inventory changes of one new VM to a plan."""
+        builder.plan.ip_allocations[vm_name] = ip_alloc
+
+        # Add VM to vms list in host_vars/restsrv01.yaml
+        srv_data = builder.load(HOST_VARS_RESTSRV01)
+        self._add_to_restsrv01_vms(srv_data, vm_name)
+        builder.write(HOST_VARS_RESTSRV01, srv_data, f"Add '{vm_name}' to vms list")
+
+        # Create host_vars/restvm-{user}-{nn}.yaml
+        builder.write(
+            get_host_vars_path(vm_name),
+            self._new_host_vars(username, ip_alloc, resources, pinning, hugepages, mtu),
+            f"[NEW] Create with dataplane_ipv4 ({ip_alloc.ip1}, {ip_alloc.ip2})"
+            + (f", {resources.vcpus} vCPUs, {resources.ram_mb} MiB RAM" if resources else "")
+            + (f", pinned to NUMA node {pinning.numa_node}" if pinning else "")
+            + (f", {hugepages} hugepages" if hugepages else "")
+            + (f", MTU {mtu}" if mtu else ""),
+        )
+
+        # Add to inventory.yaml
+        inv_data = builder.load(INVENTORY_FILE)
+        self._add_to_inventory(inv_data, vm_name)
+        builder.write(INVENTORY_FILE, inv_data, f"Add '{vm_name}' to vms.hosts")
+
+    def _plan_claim_pool_vm(self, builder: PlanBuilder, username: str, pool_vm: str, vm_name: str) -> None:
+        """Rename a warm pool VM to a tenant's VM in the vms list, its host_vars and the inventory."""
+        srv_data = builder.load(HOST_VARS_RESTSRV01)
+        srv_data["vms"][srv_data["vms"].index(pool_vm)] = vm_name
+        builder.write(HOST_VARS_RESTSRV01, srv_data, f"Claim pool VM '{pool_vm}' as '{vm_name}'")
+
+        # The pool VM keeps its dataplane IPs, it only gets an owner
+        hv_data = builder.load(get_host_vars_path(pool_vm))
+        hv_data["host_users"] = [username]
+        hv_data.pop(POOL_READY_KEY, None)
+        hv_data[CLAIMED_FROM_KEY] = pool_vm  # until the vmclaim play has renamed the domain
+        ip1, ip2 = hv_data["dataplane_ipv4"]
+        builder.plan.ip_allocations[vm_name] = IPAllocation(ip1=ip1, ip2=ip2)
+        builder.write(
+            get_host_vars_path(vm_name), hv_data, f"[NEW] Claimed from '{pool_vm}' with dataplane_ipv4 ({ip1}, {ip2})"
+        )
+        builder.delete(get_host_vars_path(pool_vm), f"Renamed to {vm_name}.yaml")
+
+        inv_data = builder.load(INVENTORY_FILE)
+        self._remove_from_inventory(inv_data, pool_vm)
+        self._add_to_inventory(inv_data, vm_name)
+        builder.write(INVENTORY_FILE, inv_data, f"Rename '{pool_vm}' to '{vm_name}' in vms.hosts")
+
+    def _allocate_pinning(self, builder: PlanBuilder, vcpus: int, pf: str | None) -> CPUPinning:
+        """Allocate dedicated host CPUs for a new VM, on the PF's NUMA node if known."""
+        srv_data = builder.load(HOST_VARS_RESTSRV01)
+        # Pinned CPUs are read from the host_vars of every defined VM
+        for vm in srv_data.get("vms") or []:
+            builder.track(get_host_vars_path(vm))
+
+        numa_node = get_pf_numa_node(srv_data, pf) if pf else None
+        try:
+            pinning = allocate_cpus(srv_data, vcpus, numa_node)
+        except ValueError as e:
+            raise ValidationError(str(e))
+        if pinning is None:
+            where = f"NUMA node {numa_node}" if numa_node is not None else "any NUMA node"
+            raise ValidationError(f"No {vcpus} free host CPUs on {where}")
+        return pinning
+
+    def _check_hugepages(self, builder: PlanBuilder, size: str, ram_mb: int) -> None:
+        """Check a new VM fits in the host's free hugepages of a size."""
+        srv_data = builder.load(HOST_VARS_RESTSRV01)
+        # Used hugepages are read from the host_vars of every defined VM
+        for vm in srv_data.get("vms") or []:
+            builder.track(get_host_vars_path(vm))
+
+        problem = check_hugepages(srv_data, size, ram_mb)
+        if problem:
+            raise ValidationError(problem)
+
+    def _check_mtu(self, builder: PlanBuilder, mtu: int) -> None:
+        """Check a VM's dataplane MTU fits the bridges and switches (dataplane_mtu in group_vars)."""
+        all_data = builder.load(GROUP_VARS_ALL)
+        configured = all_data.get("dataplane_mtu")
+        dataplane_mtu = int(configured) if configured is not None else DEFAULT_DATAPLANE_MTU
+        if not MIN_DATAPLANE_MTU <= mtu <= dataplane_mtu:
+            source = "dataplane_mtu in group_vars/all.yaml" if configured is not None else "dataplane_mtu unset in group_vars/all.yaml"
+            raise ValidationError(f"MTU {mtu} is outside {MIN_DATAPLANE_MTU}-{dataplane_mtu} ({source})")
+
+    def _plan_vf_allocation(self, builder: PlanBuilder, vm_name: str, pf: str, count: int) -> None:
+        """Add a VM's SR-IOV VF allocation to a plan."""
+        srv_data = builder.load(HOST_VARS_RESTSRV01)
+        try:
+            vf_alloc = allocate_vfs(srv_data, pf, count)
+        except ValueError as e:
+            raise ValidationError(str(e))
+        if vf_alloc is None:
+            raise ValidationError(f"No {count} free contiguous VF(s) on {pf}")
+
+        builder.plan.vf_allocations[vm_name] = vf_alloc
+        add_vf_allocation(srv_data, vm_name, vf_alloc)
+        builder.write(HOST_VARS_RESTSRV01, srv_data, f"Allocate {vf_alloc.label} to '{vm_name}'")
+
+    def _plan_admin_inventories(self, builder: PlanBuilder, summary: str) -> None:
+        """Add the regenerated admin inventories to a plan."""
+        builder.track(ADMIN_OVERRIDES_FILE)
+        inv_data = builder.load(INVENTORY_FILE)
+        for inv_path, text in render_admin_inventories(inv_data).items():
+            builder.write(inv_path, text, f"Regenerate ({summary})")
 
     def get_tenant_info(self, username: str) -> dict | None:
         """Get information about an existing tenant.
@@ -411,7 +554,8 @@ class TenantManager:
         pattern = rf"^{VM_PREFIX}-(.+)-\d+$"
         for hv_file in HOST_VARS_DIR.glob(f"{VM_PREFIX}-*.yaml"):
             match = re.match(pattern, hv_file.stem)
-            if match:
+            # Pool VMs have no tenant (see `p4tenant pool status`)
+            if match and match.group(1) != POOL_USERNAME:
                 username = match.group(1)
                 seen_usernames.add(username)
 
@@ -423,69 +567,69 @@ class TenantManager:
 
         return tenants
 
-    def _add_to_restart_users(self, username: str) -> None:
+    def _add_to_restart_users(self, data: Any, username: str) -> None:
         """Add username to restart_users list."""
-        data = load_yaml(GROUP_VARS_ALL)
         if "restart_users" not in data:
             data["restart_users"] = []
         if username not in data["restart_users"]:
             data["restart_users"].append(username)
-        save_yaml(GROUP_VARS_ALL, data)
 
-    def _remove_from_restart_users(self, username: str) -> None:
+    def _remove_from_restart_users(self, data: Any, username: str) -> bool:
         """Remove username from restart_users list."""
-        data = load_yaml(GROUP_VARS_ALL)
         if "restart_users" in data and username in data["restart_users"]:
             data["restart_users"].remove(username)
-        save_yaml(GROUP_VARS_ALL, data)
+            return True
+        return False
 
-    def _add_to_restsrv01_vms(self, vm_name: str) -> None:
+    def _add_to_restsrv01_vms(self, data: Any, vm_name: str) -> None:
         """Add VM to restsrv01 vms list."""
-        data = load_yaml(HOST_VARS_RESTSRV01)
         if "vms" not in data:
             data["vms"] = []
         if vm_name not in data["vms"]:
             data["vms"].append(vm_name)
-        save_yaml(HOST_VARS_RESTSRV01, data)
 
-    def _remove_from_restsrv01_vms(self, vm_name: str) -> None:
+    def _remove_from_restsrv01_vms(self, data: Any, vm_name: str) -> bool:
         """Remove VM from restsrv01 vms list."""
-        data = load_yaml(HOST_VARS_RESTSRV01)
         if "vms" in data and vm_name in data["vms"]:
             data["vms"].remove(vm_name)
-        save_yaml(HOST_VARS_RESTSRV01, data)
+            return True
+        return False
 
-    def _create_host_vars(
-        self, username: str, vm_name: str, ip_alloc: IPAllocation
-    ) -> None:
-        """Create host_vars file for new VM."""
+    def _new_host_vars(
+        self,
+        username: str | None,
+        ip_alloc: IPAllocation,
+        resources: VMResources | None = None,
+        pinning: CPUPinning | None = None,
+        hugepages: str | None = None,
+        mtu: int | None = None,
+    ) -> CommentedMap:
+        """Build the host_vars document for a new VM (without host_users for pool VMs)."""
         data = CommentedMap()
         data["dataplane_ipv4"] = [ip_alloc.ip1, ip_alloc.ip2]
+        if resources:
+            data["vm_vcpus"] = resources.vcpus
+            data["vm_ram_mb"] = resources.ram_mb
+        if pinning:
+            data["vm_numa_node"] = pinning.numa_node
+            cpus = CommentedSeq(pinning.cpus)
+            cpus.fa.set_flow_style()
+            data["vm_cpus"] = cpus
+        if hugepages:
+            data["vm_hugepages"] = hugepages
+        if mtu:
+            data["vm_dataplane_mtu"] = mtu
 
         # Add comment before host_users
-        data["host_users"] = [username]
+        data["host_users"] = [username] if username else []
         data.yaml_set_comment_before_after_key(
             "host_users",
             before="NOTE: this must be a list (even with single entry) or it will fail",
         )
+        return data
 
-        host_vars_path = get_host_vars_path(vm_name)
-        save_yaml(host_vars_path, data, backup=False)
-
-    def _delete_host_vars(self, vm_name: str) -> None:
-        """Delete host_vars file for a VM."""
-        from .yaml_editor import create_backup
-
-        host_vars_path = get_host_vars_path(vm_name)
-        if host_vars_path.exists():
-            # Create backup before deletion
-            create_backup(host_vars_path)
-            host_vars_path.unlink()
-
-    def _add_to_inventory(self, vm_name: str) -> None:
+    def _add_to_inventory(self, data: Any, vm_name: str) -> None:
         """Add VM to inventory vms.hosts."""
-        data = load_yaml(INVENTORY_FILE)
-
         if "vms" not in data:
             data["vms"] = CommentedMap()
         if "hosts" not in data["vms"]:
@@ -498,14 +642,15 @@ class TenantManager:
 
         data["vms"]["hosts"][vm_name] = host_entry
 
-        save_yaml(INVENTORY_FILE, data)
-
-    def _remove_from_inventory(self, vm_name: str) -> None:
+    def _remove_from_inventory(self, data: Any, vm_name: str) -> bool:
         """Remove VM from inventory vms.hosts."""
-        data = load_yaml(INVENTORY_FILE)
-
         if "vms" in data and "hosts" in data["vms"]:
             if vm_name in data["vms"]["hosts"]:
                 del data["vms"]["hosts"][vm_name]
+                return True
+        return False
+
 
-        save_yaml(INVENTORY_FILE, data)
+def _quoted(names: list[str]) -> str:
+    """Format names for change descriptions, e.g. "'a', 'b'"."""
+    return ", ".join(f"'{name}'" for name in names)
@@ -161,3 +161,299 @@ def create_ip_status_table(status: dict) -> Table:
         table.add_row("Next Available Pair", "[red]None available[/red]")
 
     return table
+
+
+def create_capacity_table(status: dict) -> Table:
+    """Create a table showing committed vs available host resources.
+
+    Args:
+        status: Capacity status dictionary from capacity
+
+    Returns:
+        Rich Table object
+    """
+    capacity = status["capacity"]
+    table = Table(title="restsrv01 Capacity")
+    table.add_column("Resource", style="cyan")
+    table.add_column("Host", justify="right")
+    table.add_column("Limit", justify="right")
+    table.add_column("Committed", justify="right")
+    table.add_column("Available", justify="right")
+
+    rows = [("vCPUs", "vcpus", "vcpu_limit", "vcpu_overcommit", ""), ("RAM", "ram_mb", "ram_limit", "ram_overcommit", " MiB")]
+    for name, key, limit_key, ratio_key, unit in rows:
+        committed = status[key]
+        if capacity is None:
+            table.add_row(name, "-", "-", f"{committed}{unit}", "-")
+            continue
+        limit = status[limit_key]
+        available = limit - committed
+        color = "red" if available < 0 else "green"
+        table.add_row(
+            name,
+            f"{getattr(capacity, key)}{unit}",
+            f"{limit}{unit} (x{getattr(capacity, ratio_key):g})",
+            f"{committed}{unit} ({committed / limit:.0%})" if limit else f"{committed}{unit}",
+            f"[{color}]{available}{unit}[/{color}]",
+        )
+
+    for size, (reserved, used) in status["hugepages"].items():
+        available = reserved - used
+        color = "red" if available < 0 else "green"
+        table.add_row(
+            f"Hugepages {size}",
+            str(reserved),
+            str(reserved),
+            f"{used} ({used / reserved:.0%})" if reserved else str(used),
+            f"[{color}]{available}[/{color}]",
+        )
+
+    return table
+
+
+def create_vm_resources_table(vms: dict) -> Table:
+    """Create a table showing the vCPUs and RAM of every VM.
+
+    Args:
+        vms: VM name to VMResources mapping
+
+    Returns:
+        Rich Table object
+    """
+    table = Table(title="VM Sizes")
+    table.add_column("VM Name", style="cyan")
+    table.add_column("vCPUs", justify="right")
+    table.add_column("RAM (MiB)", justify="right")
+
+    for vm_name, resources in vms.items():
+        table.add_row(vm_name, str(resources.vcpus), str(resources.ram_mb))
+
+    return table
+
+
+def create_pool_table(status: dict) -> Table:
+    """Create a table showing the warm VM pool.
+
+    Args:
+        status: Pool status from pool.get_pool_status
+
+    Returns:
+        Rich Table object
+    """
+    table = Table(title=f"Warm VM Pool ({len(status['ready'])}/{status['size']} ready)")
+    table.add_column("VM", style="cyan")
+    table.add_column("Dataplane IPs", style="white")
+    table.add_column("Ready", style="white")
+
+    for vm_name, ips in status["vms"].items():
+        ready = "[green]yes[/green]" if vm_name in status["ready"] else "[yellow]no[/yellow]"
+        table.add_row(vm_name, ", ".join(ips), ready)
+
+    return table
+
+
+def create_sriov_status_table(status: list[dict]) -> Table:
+    """Create a table showing SR-IOV VF utilisation per PF.
+
+    Args:
+        status: PF status list from sriov_allocator
+
+    Returns:
+        Rich Table object
+    """
+    table = Table(title="SR-IOV VF Allocation")
+    table.add_column("PF", style="cyan")
+    table.add_column("VFs (#=static)", style="white", no_wrap=True)
+    table.add_column("Static", justify="right")
+    table.add_column("Pool VMs", justify="right")
+    table.add_column("Free", justify="right")
+    table.add_column("Largest Range", justify="right")
+
+    for pf in status:
+        free = f"[red]{pf['free']}[/red]" if pf["free"] <= 0 else f"[green]{pf['free']}[/green]"
+        table.add_row(
+            pf["pf"],
+            pf["map"],
+            f"{pf['static']}/{pf['num_vfs']}",
+            str(len(pf["pool_vms"])),
+            free,
+            str(pf["largest_free_range"]),
+        )
+
+    return table
+
+
+def create_vf_assignment_table(status: list[dict]) -> Table:
+    """Create a table showing which VMs own which VFs.
+
+    Args:
+        status: PF status list from sriov_allocator
+
+    Returns:
+        Rich Table object
+    """
+    table = Table(title="VF Assignments")
+    table.add_column("VM Name", style="cyan")
+    table.add_column("PF", style="white")
+    table.add_column("VFs", style="yellow")
+
+    for pf in status:
+        for vm, vfs in pf["assigned"].items():
+            table.add_row(vm, pf["pf"], f"{vfs[0]}-{vfs[-1]}" if len(vfs) > 1 else str(vfs[0]))
+        for vm in pf["pool_vms"]:
+            table.add_row(vm, pf["pf"], f"[dim]any (pool {pf['pool']})[/dim]")
+
+    return table
+
+
+def create_profile_table(profile: dict) -> Table:
+    """Create a table showing the per-phase timing breakdown.
+
+    Args:
+        profile: Span tree dictionary from the profiler
+
+    Returns:
+        Rich Table object
+    """
+    show_memory = profile.get("peak_bytes", 0) > 0
+    root_ms = profile["total_ms"] or 1.0
+
+    table = Table(title="Profile", box=None, padding=(0, 2))
+    table.add_column("Phase", style="cyan")
+    table.add_column("Calls", justify="right", style="dim")
+    table.add_column("Time", justify="right", style="yellow")
+    table.add_column("%", justify="right", style="dim")
+    if show_memory:
+        table.add_column("Peak mem", justify="right", style="magenta")
+
+    def add_rows(node: dict, depth: int) -> None:
+        row = [
+            "  " * depth + node["name"],
+            str(node["calls"]),
+            f"{node['total_ms']:.1f} ms",
+            f"{100 * node['total_ms'] / root_ms:.0f}",
+        ]
+        if show_memory:
+            row.append(f"{node['peak_bytes'] / 1024:.0f} KiB")
+        table.add_row(*row)
+
+        for child in sorted(node["children"], key=lambda c: -c["total_ms"]):
+            add_rows(child, depth + 1)
+
+    add_rows(profile, 0)
+    return table
+
+
+def create_metrics_table(records: list[dict]) -> Table:
+    """Create a table showing recorded command runs.
+
+    Args:
+        records: Run records from the metrics file
+
+    Returns:
+        Rich Table object
+    """
+    from datetime import datetime
+
+    table = Table(title="p4tenant Runs")
+    table.add_column("Time", style="dim")
+    table.add_column("Command", style="cyan")
+    table.add_column("Tenant", style="white")
+    table.add_column("VMs", justify="right")
+    table.add_column("Duration", justify="right", style="yellow")
+    table.add_column("Slowest phase", style="white")
+    table.add_column("Ansible", justify="right")
+    table.add_column("Written", justify="right", style="dim")
+
+    for record in records:
+        phases = record.get("phases_s", {})
+        if phases:
+            slowest = max(phases, key=phases.get)
+            slowest_text = f"{slowest} ({phases[slowest]:.1f}s)"
+        else:
+            slowest_text = ""
+
+        ansible_code = record.get("ansible_exit_code")
+        if ansible_code is None:
+            ansible_text = "[dim]-[/dim]"
+        elif ansible_code == 0:
+            ansible_text = "[green]ok[/green]"
+        else:
+            ansible_text = f"[red]{ansible_code}[/red]"
+
+        timestamp = datetime.fromtimestamp(record.get("timestamp", 0)).strftime("%m-%d %H:%M")
+        exit_code = record.get("exit_code", 0)
+        command = record.get("command", "")
+        if exit_code:
+            command = f"{command} [red](exit {exit_code})[/red]"
+
+        table.add_row(
+            timestamp,
+            command,
+            record.get("tenant") or "",
+            str(record.get("vm_count", 0)),
+            f"{record.get('duration_s', 0):.1f}s",
+            slowest_text,
+            ansible_text,
+            f"{record.get('bytes_written', 0)} B",
+        )
+
+    return table
+
+
+def create_issues_table(issues: list) -> Table:
+    """Create a table showing consistency issues.
+
+    Args:
+        issues: List of Issue objects from the doctor checks
+
+    Returns:
+        Rich Table object
+    """
+    table = Table(title="Configuration Issues")
+    table.add_column("", style="white")
+    table.add_column("Check", style="cyan", no_wrap=True)
+    table.add_column("Problem", style="white")
+    table.add_column("Fix", style="green")
+
+    for issue in issues:
+        if issue.severity == "error":
+            severity = "[red]\u2717[/red]"
+        else:
+            severity = "[yellow]![/yellow]"
+        table.add_row(severity, issue.check, issue.message, issue.fix or "[dim]manual[/dim]")
+
+    return table
+
+
+def create_provision_table(runs: list) -> Table:
+    """Create the live status table for concurrent provisioning.
+
+    Args:
+        runs: VMRun objects from provision.py
+
+    Returns:
+        Rich Table object
+    """
+    status_styles = {
+        "queued": "[dim]queued[/dim]",
+        "waiting": "[yellow]waiting[/yellow]",
+        "running": "[cyan]running[/cyan]",
+        "ok": "[green]✓ ok[/green]",
+        "failed": "[red]✗ failed[/red]",
+    }
+
+    table = Table(title="Provisioning")
+    table.add_column("VM", style="cyan", no_wrap=True)
+    table.add_column("Status", no_wrap=True)
+    table.add_column("Play", style="white", no_wrap=True)
+    table.add_column("Task", style="dim", overflow="ellipsis", no_wrap=True, max_width=40)
+    table.add_column("Time", justify="right", style="yellow")
+
+    for run in runs:
+        status = status_styles.get(run.status, run.status)
+        if run.status == "failed":
+            status = f"{status} [red]({run.returncode})[/red]"
+        table.add_row(run.vm_name, status, run.stage, run.task, f"{run.elapsed:.0f}s")
+
+    return table
@@ -1,7 +1,9 @@
 """Safe YAML editing with ruamel.yaml that preserves comments and formatting."""
 
+import os
 import shutil
 from datetime import datetime
+from io import StringIO
 from pathlib import Path
 from tempfile import NamedTemporaryFile
 from typing import Any
@@ -9,6 +11,8 @@ from typing import Any
 from ruamel.yaml import YAML
 
 from .config import BACKUP_DIR
+from .metrics import run_metrics
+from .profiling import span
 
 
 def get_yaml() -> YAML:
@@ -22,9 +26,10 @@ def get_yaml() -> YAML:
 
 def load_yaml(path: Path) -> Any:
     """Load a YAML file preserving comments."""
-    yaml = get_yaml()
-    with open(path, "r") as f:
-        return yaml.load(f)
+    with span("yaml load"):
+        yaml = get_yaml()
+        with open(path, "r") as f:
+            return yaml.load(f)
 
 
 def save_yaml(path: Path, data: Any, backup: bool = True) -> None:
@@ -38,14 +43,24 @@ def save_yaml(path: Path, data: Any, backup: bool = True) -> None:
     if backup and path.exists():
         create_backup(path)
 
-    # Write to temp file first, then rename (atomic)
-    with NamedTemporaryFile(mode="w", suffix=".yaml", delete=False) as tmp:
-        yaml = get_yaml()
-        yaml.dump(data, tmp)
-        tmp_path = Path(tmp.name)
+    with span("yaml write"):
+        # Write to temp file first, then rename (atomic)
+        with NamedTemporaryFile(mode="w", suffix=".yaml", delete=False) as tmp:
+            yaml = get_yaml()
+            yaml.dump(data, tmp)
+            tmp_path = Path(tmp.name)
+
+        run_metrics.add_write(tmp_path.stat().st_size)
+
+        # Atomic rename
+        shutil.move(tmp_path, path)
+
 
-    # Atomic rename
-    shutil.move(tmp_path, path)
+def dump_yaml_str(data: Any) -> str:
+    """Render YAML data to a string with the standard formatting."""
+    stream = StringIO()
+    get_yaml().dump(data, stream)
+    return stream.getvalue()
 
 
 def create_backup(path: Path) -> Path:
@@ -57,14 +72,15 @@ def create_backup(path: Path) -> Path:
     Returns:
         Path to the backup file
     """
-    BACKUP_DIR.mkdir(parents=True, exist_ok=True)
+    with span("backup"):
+        BACKUP_DIR.mkdir(parents=True, exist_ok=True)
 
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    backup_name = f"{path.stem}_{timestamp}{path.suffix}"
-    backup_path = BACKUP_DIR / backup_name
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        backup_name = f"{path.stem}_{timestamp}{path.suffix}"
+        backup_path = BACKUP_DIR / backup_name
 
-    shutil.copy2(path, backup_path)
-    return backup_path
+        shutil.copy2(path, backup_path)
+        return backup_path
 
 
 def append_to_list(data: Any, key: str, value: str) -> bool:
@@ -112,3 +128,83 @@ def remove_from_list(data: Any, key: str, value: str) -> bool:
         return True
 
     return False
+
+
+class YamlTransaction:
+    """Stage several YAML writes and deletions, then apply them together.
+
+    All new contents are rendered to temp files next to their targets before
+    anything is replaced. If replacing any file fails, every file touched so
+    far is restored to its original content.
+    """
+
+    def __init__(self) -> None:
+        self._writes: dict[Path, Any] = {}
+        self._deletes: set[Path] = set()
+
+    def __bool__(self) -> bool:
+        return bool(self._writes or self._deletes)
+
+    @property
+    def paths(self) -> list[Path]:
+        """Paths that will be written or deleted."""
+        return sorted(set(self._writes) | self._deletes)
+
+    def save(self, path: Path, data: Any) -> None:
+        """Stage a YAML document (or already rendered text) to be written to path."""
+        self._deletes.discard(path)
+        self._writes[path] = data
+
+    def delete(self, path: Path) -> None:
+        """Stage deletion of path."""
+        self._writes.pop(path, None)
+        self._deletes.add(path)
+
+    def commit(self, backup: bool = True) -> list[Path]:
+        """Apply all staged changes.
+
+        Args:
+            backup: Whether to back up existing files before replacing them
+
+        Returns:
+            List of paths that were written or deleted
+        """
+        originals: dict[Path, bytes | None] = {}
+        staged: dict[Path, Path] = {}
+
+        with span("yaml write"):
+            try:
+                # Render everything first so a dump error leaves the tree untouched
+                yaml = get_yaml()
+                for path, data in self._writes.items():
+                    tmp_path = path.with_name(f".{path.name}.p4tenant.tmp")
+                    with open(tmp_path, "w") as f:
+                        if isinstance(data, str):
+                            f.write(data)
+                        else:
+                            yaml.dump(data, f)
+                    staged[path] = tmp_path
+                    run_metrics.add_write(tmp_path.stat().st_size)
+
+                for path in self.paths:
+                    originals[path] = path.read_bytes() if path.exists() else None
+                    if backup and originals[path] is not None:
+                        create_backup(path)
+
+                for path, tmp_path in staged.items():
+                    os.replace(tmp_path, path)
+                for path in self._deletes:
+                    if path.exists():
+                        path.unlink()
+            except Exception:
+                for path, content in originals.items():
+                    if content is None:
+                        path.unlink(missing_ok=True)
+                    else:
+                        path.write_bytes(content)
+                raise
+            finally:
+                for tmp_path in staged.values():
+                    tmp_path.unlink(missing_ok=True)
+
+        return self.paths
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""Reservation agent: grants SSH access on this switch to users with an active reservation.
+
+Long-running replacement of enable_ssh_access.sh. It polls the dashboard's
+/api/active_reservations over one persistent HTTP connection, sending the
+last ETag as If-None-Match (and, with --long-poll, asking the server to hold
+the request until the reservations change). Each cycle it computes the
+desired deny-ssh membership and runs gpasswd only when it differs from the
+current one.
+
+Policy (same as the cron script):
+- no active reservation: leave deny-ssh as it is (best effort service)
+- otherwise: deny-ssh = members of the p4-restart group, minus the admin
+  and the users holding a reservation now
+
+Only the Python standard library is used. To try it against a local
+stand-in server:
+
+    mkdir -p /tmp/dash/api
+    echo '[{"username": "alice", "to": "2030-01-01 10:00"}]' > /tmp/dash/api/active_reservations
+    (cd /tmp/dash && python3 -m http.server 8000) &
+    ./reservation_agent.py --url http://127.0.0.1:8000 --dry-run --once
+"""
+
+from __future__ import annotations
+
+import argparse
+import grp
+import hashlib
+import http.client
+import json
+import logging
+import pwd
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import urllib.parse
+
+log = logging.getLogger("reservation-agent")
+
+
+class ReservationClient:
+    """Fetches active reservations for one switch over a persistent connection."""
+
+    def __init__(self, url: str, target: str, long_poll: int = 0, timeout: float = 10.0) -> None:
+        parsed = urllib.parse.urlsplit(url)
+        self.scheme = parsed.scheme or "http"
+        self.netloc = parsed.netloc
+        query = {"target": target}
+        if long_poll:
+            query["wait"] = str(long_poll)
+        self.path = f"{parsed.path.rstrip('/')}/api/active_reservations?{urllib.parse.urlencode(query)}"
+        # A long-polled request may legitimately stay open for long_poll seconds
+        self.timeout = timeout + long_poll
+        self.etag = None
+        self.digest = None
+        self.reservations = None
+        self._conn = None
+
+    def _connection(self) -> http.client.HTTPConnection:
+        if self._conn is None:
+            cls = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+            self._conn = cls(self.netloc, timeout=self.timeout)
+        return self._conn
+
+    def close(self) -> None:
+        """Drop the connection (it is reopened on the next fetch)."""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def fetch(self) -> bool:
+        """Fetch the active reservations.
+
+        Returns:
+            True if they changed since the previous fetch
+
+        Raises:
+            OSError, http.client.HTTPException, ValueError: On connection,
+                HTTP or JSON errors
+        """
+        headers = {"Accept": "application/json"}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+
+        conn = self._connection()
+        try:
+            conn.request("GET", self.path, headers=headers)
+            response = conn.getresponse()
+            body = response.read()
+        except (OSError, http.client.HTTPException):
+            self.close()
+            raise
+
+        if response.status == 304:
+            return False
+        if response.status != 200:
+            raise http.client.HTTPException(f"HTTP {response.status} from {self.netloc}{self.path}")
+
+        self.etag = response.getheader("ETag")
+        # Servers without ETag support: detect changes from the body itself
+        digest = hashlib.sha256(body).hexdigest()
+        if digest == self.digest:
+            return False
+
+        reservations = json.loads(body or b"[]")
+        if not isinstance(reservations, list):
+            raise ValueError(f"Expected a list of reservations, got: {body[:200]!r}")
+        self.digest = digest
+        self.reservations = reservations
+        return True
+
+
+def group_members(name: str) -> set[str]:
+    """Get the users of a group, including those having it as primary group."""
+    group = grp.getgrnam(name)
+    members = set(group.gr_mem)
+    members |= {user.pw_name for user in pwd.getpwall() if user.pw_gid == group.gr_gid}
+    return members
+
+
+def desired_denied(reservations: list[dict], users_group: str, admin: str) -> set[str] | None:
+    """Get the users to deny SSH access to, or None to leave access unchanged."""
+    allowed = {str(r["username"]) for r in reservations if r.get("username")}
+    if not allowed:
+        return None
+    return group_members(users_group) - allowed - {admin}
+
+
+def set_group_members(group: str, members: set[str]) -> None:
+    """Replace the member list of a group."""
+    subprocess.run(["gpasswd", "-M", ",".join(sorted(members)), group], check=True, capture_output=True)
+
+
+class Agent:
+    """Keeps the deny-ssh group in line with the active reservations."""
+
+    def __init__(self, client: ReservationClient, args: argparse.Namespace) -> None:
+        self.client = client
+        self.args = args
+        self._stopped = threading.Event()
+
+    def sync(self) -> None:
+        """Fetch reservations and apply the deny-ssh delta, if any."""
+        if self.client.fetch():
+            users = ", ".join(f"{r.get('username')} (until {r.get('to')})" for r in self.client.reservations)
+            log.info("Active reservations: %s", users or "none")
+
+        if self.client.reservations is None:
+            return
+        # Evaluated every cycle, so local changes to the groups are caught too
+        denied = desired_denied(self.client.reservations, self.args.users_group, self.args.admin)
+        if denied is None:
+            return
+
+        current = set(grp.getgrnam(self.args.deny_group).gr_mem)
+        if denied == current:
+            return
+
+        log.info(
+            "Updating %s: deny %s, allow %s",
+            self.args.deny_group,
+            ", ".join(sorted(denied - current)) or "-",
+            ", ".join(sorted(current - denied)) or "-",
+        )
+        if not self.args.dry_run:
+            set_group_members(self.args.deny_group, denied)
+
+    def run(self) -> int:
+        """Sync until stopped (or once with --once)."""
+        failures = 0
+        while not self._stopped.is_set():
+            try:
+                self.sync()
+                failures = 0
+            except (OSError, http.client.HTTPException, ValueError, KeyError, subprocess.CalledProcessError) as e:
+                failures += 1
+                log.error("Sync failed: %s", e)
+                if self.args.once:
+                    return 1
+
+            if self.args.once:
+                return 0
+            # Back off up to 60s while the dashboard is unreachable
+            self._stopped.wait(self.args.interval if not failures else min(60, self.args.interval * 2**failures))
+        return 0
+
+    def stop(self, *_) -> None:
+        """Stop after the current cycle (SIGTERM handler)."""
+        self._stopped.set()
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", required=True, help="Dashboard base URL, e.g. http://restsrv01.polito.it/dashboard")
+    parser.add_argument("--target", default=socket.gethostname(), help="Switch name (default: hostname)")
+    parser.add_argument("--interval", type=float, default=5, help="Seconds between requests (default: 5)")
+    parser.add_argument("--long-poll", type=int, default=0, help="Ask the server to hold requests up to N seconds")
+    parser.add_argument("--users-group", default="p4-restart", help="Group of users subject to reservations")
+    parser.add_argument("--deny-group", default="deny-ssh", help="Group denied by sshd DenyGroups")
+    parser.add_argument("--admin", default="p4-restart", help="User never denied")
+    parser.add_argument("--log-file", help="Also log to this file")
+    parser.add_argument("--once", action="store_true", help="Sync once and exit (non-zero on failure)")
+    parser.add_argument("--dry-run", action="store_true", help="Log changes without applying them")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str]) -> int:
+    args = parse_args(argv)
+
+    handlers = [logging.StreamHandler()]
+    if args.log_file:
+        handlers.append(logging.FileHandler(args.log_file))
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s", handlers=handlers)
+
+    client = ReservationClient(args.url, args.target, args.long_poll)
+    agent = Agent(client, args)
+    signal.signal(signal.SIGTERM, agent.stop)
+
+    log.info("Starting reservation agent for %s (%s)", args.target, args.url)
+    try:
+        return agent.run()
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))